@@ -1,7 +1,19 @@
 import pygame
-import sys
+import os
 import math
 import random
+import threading
+import time
+import argparse
+import multiprocessing
+
+import checkers_book
+import checkers_tablebase
+import game_record
+import learned_eval
+from game_search import Searcher, SearchCancelled, init_worker
+from move_profiler import profiled
+from render_scheduler import RenderScheduler
 
 pygame.init()
 
@@ -19,11 +31,61 @@ GOLD  = (255, 215, 0)
 GRAY  = (100, 100, 100)
 YELLOW = (255, 255, 0)
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Checkers")
+screen = None   # created in main() so --analyze and the launcher can import without a window
 FONT = pygame.font.SysFont("arial", 26)
 BIG_FONT = pygame.font.SysFont("arial", 40)
-clock = pygame.time.Clock()
+scheduler = None   # RenderScheduler for the window, created with it in main()
+SEARCH_DONE = pygame.event.custom_type()   # posted by SearchWorker so an idle main loop wakes up
+
+TB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkers_tb.bin")
+TABLEBASE = checkers_tablebase.load(TB_PATH)   # None until checkers_tablebase.py has been run
+TB_WIN = 100000   # well above any piece-square score
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkers_book.bin")
+BOOK = checkers_book.load(BOOK_PATH)   # None until checkers_book.py has been run
+BOOK_MODE = "vary"   # "vary" picks among the good book moves, "best" always the top one, "off" ignores the book
+BOOK_SPREAD = 10     # points below the best book move that halve a move's chance in "vary"
+EVAL_MODEL = learned_eval.load(learned_eval.CHECKERS_PATH, "checkers")   # None until learned_eval.py has been run
+AI_DELAY = 500   # ms an AI move stays on screen before the next one is applied
+AI_DEPTH = 3     # plies the BLUE AI searches in play
+ROOT_POOL = None   # RootSearchPool when started with --workers > 1
+SEARCHER = Searcher()   # one per process; pool workers get their own copy
+
+# ================= EVALUATION =================
+# piece-square tables, in points where a man is worth 100
+MAN, KING = 100, 160
+ADVANCE = [0, 2, 4, 7, 10, 14, 19, 0]   # by rows moved towards promotion
+BACK_RANK = 8                           # men left on the home row keep enemy men from crowning
+CENTER = 5                              # the four middle columns of the two middle rows
+KING_STEP = 4                           # per diagonal a king can step along from this square
+
+def build_pst():
+    # PST[(color, king)][r][c], positive for BLUE and negative for RED
+    pst = {}
+    for color in (RED, BLUE):
+        sign = 1 if color == BLUE else -1
+        for king in (False, True):
+            table = [[0]*COLS for _ in range(ROWS)]
+            for r in range(ROWS):
+                for c in range(COLS):
+                    center = CENTER if 3 <= r <= 4 and 2 <= c <= 5 else 0
+                    if king:
+                        steps = sum(1 for dr in (-1, 1) for dc in (-1, 1)
+                                    if 0 <= r+dr < ROWS and 0 <= c+dc < COLS)
+                        value = KING + KING_STEP * steps + center
+                    else:
+                        advance = r if color == BLUE else ROWS - 1 - r
+                        value = MAN + ADVANCE[advance] + center + (BACK_RANK if advance == 0 else 0)
+                    table[r][c] = sign * value
+            pst[color, king] = table
+    return pst
+
+PST = build_pst()
+
+# random keys per (color, king) and square, xor-ed into Board.hash as pieces come and go
+_rng = random.Random(8)
+ZOBRIST = {(color, king): [[_rng.getrandbits(64) for _ in range(COLS)] for _ in range(ROWS)]
+           for color in (RED, BLUE) for king in (False, True)}
+BLUE_TO_MOVE = _rng.getrandbits(64)
 
 # ================= PIECE =================
 class Piece:
@@ -41,9 +103,23 @@ class Piece:
             pygame.draw.circle(screen, GOLD, (x, y), 10)
 
 # ================= BOARD =================
+def cell_rect(r, c):
+    return pygame.Rect(c*CELL, r*CELL, CELL, CELL)
+
+def paint_squares(surface):
+    # the static layer: the empty checkerboard
+    for r in range(ROWS):
+        for c in range(COLS):
+            color = WHITE if (r+c)%2==0 else BLACK
+            pygame.draw.rect(surface, color, cell_rect(r, c))
+
 class Board:
     def __init__(self):
         self.board = [[None]*COLS for _ in range(ROWS)]
+        self.counts = {RED: 0, BLUE: 0}
+        self.score = 0   # piece-square evaluation, kept up to date by move/remove/unmake
+        self.hash = 0    # zobrist key of the pieces, kept up to date the same way
+        self._moves = {}
         self.create()
 
     def create(self):
@@ -52,21 +128,32 @@ class Board:
                 if (r+c)%2 != 0:
                     if r < 3:
                         self.board[r][c] = Piece(r, c, BLUE)
+                        self.counts[BLUE] += 1
+                        self.score += PST[BLUE, False][r][c]
+                        self.hash ^= ZOBRIST[BLUE, False][r][c]
                     elif r > 4:
                         self.board[r][c] = Piece(r, c, RED)
+                        self.counts[RED] += 1
+                        self.score += PST[RED, False][r][c]
+                        self.hash ^= ZOBRIST[RED, False][r][c]
 
-    def draw(self):
+    def draw(self, rects):
+        # pieces on the squares touched by rects; the squares themselves are the static layer
         for r in range(ROWS):
             for c in range(COLS):
-                color = WHITE if (r+c)%2==0 else BLACK
-                pygame.draw.rect(screen, color, (c*CELL, r*CELL, CELL, CELL))
-                if self.board[r][c]:
+                if self.board[r][c] and cell_rect(r, c).collidelist(rects) != -1:
                     self.board[r][c].draw()
 
+    def view(self):
+        # {(r, c): (color, king)} for every piece, to tell which squares changed between frames
+        return {(r, c): (p.color, p.king) for r, row in enumerate(self.board) for c, p in enumerate(row) if p}
+
     def get_piece(self, r, c):
         return self.board[r][c]
 
     def move(self, piece, r, c):
+        self.score -= PST[piece.color, piece.king][piece.row][piece.col]
+        self.hash ^= ZOBRIST[piece.color, piece.king][piece.row][piece.col]
         self.board[piece.row][piece.col] = None
         piece.row, piece.col = r, c
         self.board[r][c] = piece
@@ -75,19 +162,56 @@ class Board:
             piece.king = True
         elif piece.color == BLUE and piece.row == ROWS - 1:
             piece.king = True
+        self.score += PST[piece.color, piece.king][r][c]
+        self.hash ^= ZOBRIST[piece.color, piece.king][r][c]
+        self._moves = {}
+
+    def remove(self, pieces):
+        for p in pieces:
+            self.board[p.row][p.col] = None
+            self.counts[p.color] -= 1
+            self.score -= PST[p.color, p.king][p.row][p.col]
+            self.hash ^= ZOBRIST[p.color, p.king][p.row][p.col]
+        if pieces:
+            self._moves = {}
+
+    def make(self, piece, move, skip):
+        # play a move in place for the search; returns what unmake() needs to take it back
+        undo = (piece, piece.row, piece.col, piece.king, skip, self._moves, self.score, self.hash)
+        self.move(piece, *move)
+        self.remove(skip)
+        return undo
+
+    def unmake(self, undo):
+        piece, r, c, king, skip, moves, score, key = undo
+        self.board[piece.row][piece.col] = None
+        piece.row, piece.col, piece.king = r, c, king
+        self.board[r][c] = piece
+        for p in skip:
+            self.board[p.row][p.col] = p
+            self.counts[p.color] += 1
+        self._moves = moves
+        self.score = score
+        self.hash = key
 
     def get_all(self, color):
         return [self.board[r][c] for r in range(ROWS) for c in range(COLS)
                 if self.board[r][c] and self.board[r][c].color == color]
 
+    def legal_moves(self, color):
+        # {piece: moves} for every piece of color that can move, cached until the next move
+        moves = self._moves.get(color)
+        if moves is None:
+            moves = {}
+            for p in self.get_all(color):
+                m = get_moves(self, p)
+                if m:
+                    moves[p] = m
+            self._moves[color] = moves
+        return moves
+
     def evaluate(self):
-        score = 0
-        for row in self.board:
-            for p in row:
-                if p:
-                    value = 2 if p.king else 1
-                    score += value if p.color == BLUE else -value
-        return score
+        return self.score
 
     def copy(self):
         b = Board()
@@ -99,6 +223,9 @@ class Board:
                     cp = Piece(p.row, p.col, p.color)
                     cp.king = p.king
                     b.board[r][c] = cp
+        b.counts = dict(self.counts)
+        b.score = self.score
+        b.hash = self.hash
         return b
 
 # ================= MOVES =================
@@ -120,44 +247,316 @@ def get_moves(board, piece):
 
 def simulate(board, piece, move, skip):
     board.move(piece, *move)
-    for s in skip:
-        board.board[s.row][s.col] = None
+    board.remove(skip)
     return board
 
-# ================= MINIMAX =================
-def minimax(board, depth, alpha, beta, max_player):
-    if depth == 0:
-        return board.evaluate(), board
+# ================= TABLEBASE =================
+def tb_score(board, max_player):
+    # exact endgame score from BLUE's point of view, None when the tablebase doesn't cover board
+    if TABLEBASE is None:
+        return None
+    mover, other = (BLUE, RED) if max_player else (RED, BLUE)
+    if not board.counts[mover]:
+        score = -TB_WIN
+    elif not board.counts[other]:
+        score = TB_WIN
+    elif board.counts[mover] + board.counts[other] > TABLEBASE.max_pieces:
+        return None
+    else:
+        pieces = [(p.row, p.col, p.color == mover, p.king) for row in board.board for p in row if p]
+        v = TABLEBASE.probe(checkers_tablebase.encode(pieces, flipped=(mover == BLUE)))
+        if v > 0:
+            score = TB_WIN - v           # win in v plies, faster is better
+        elif v < 0:
+            score = -TB_WIN - v - 1      # loss in -v-1 plies, slower is better
+        else:
+            score = 0
+    return score if max_player else -score
+
+def tb_root(board, max_player):
+    # pick the tablebase-best move directly instead of searching
+    if tb_score(board, max_player) is None:
+        return None
+    best_val, best = None, None
+    for move in SearchPosition(board, BLUE if max_player else RED).moves():
+        val = tb_score(play(board, move), not max_player)
+        if best is None or (val > best_val if max_player else val < best_val):
+            best_val, best = val, move
+    if best is None:
+        return None
+    return best_val, best
+
+# ================= LEARNED EVALUATION =================
+FEATURES = 4 * 32 + 1   # a piece kind on each dark square, then BLUE to move
+
+def feature_indices(board, color):
+    # blue men, blue kings, red men, red kings on squares 0-31 numbered row by row
+    indices = [128] if color == BLUE else []
+    for r, row in enumerate(board.board):
+        for c, p in enumerate(row):
+            if p:
+                kind = (0 if p.color == BLUE else 2) + p.king
+                indices.append(kind * 32 + checkers_tablebase.rc_square(r, c))
+    return indices
+
+def position_features(board, color):
+    return learned_eval.one_hot([feature_indices(board, color)], FEATURES)[0]
+
+# ================= SEARCH =================
+class SearchPosition:
+    # a Board and the side to move, in the form game_search.Searcher expects; BLUE maximizes
+    def __init__(self, board, color):
+        self.board = board
+        self.color = color
+        self.batch = EVAL_MODEL is not None   # game_search then scores leaves through evaluate_moves()
+
+    def moves(self):
+        # plain squares, so moves stay valid in the transposition table across board copies
+        return [((p.row, p.col), move, tuple((s.row, s.col) for s in skip))
+                for p, moves in self.board.legal_moves(self.color).items()
+                for move, skip in moves.items()]
+
+    def make(self, move):
+        (r, c), dest, skip = move
+        board = self.board
+        undo = board.make(board.board[r][c], dest, [board.board[sr][sc] for sr, sc in skip])
+        self.color = BLUE if self.color == RED else RED
+        return undo
+
+    def unmake(self, undo):
+        self.board.unmake(undo)
+        self.color = BLUE if self.color == RED else RED
+
+    def key(self):
+        return self.board.hash ^ (BLUE_TO_MOVE if self.color == BLUE else 0)
+
+    def terminal(self):
+        # a side that cannot move has lost, which the search already scores by itself
+        return None
 
-    best = None
+    def evaluate(self):
+        score = tb_score(self.board, self.color == BLUE)
+        if score is not None:
+            return score
+        if EVAL_MODEL:
+            return EVAL_MODEL.score(learned_eval.one_hot([feature_indices(self.board, self.color)], FEATURES))[0]
+        return self.board.evaluate()
+
+    def evaluate_moves(self, moves):
+        # scores after each move: tablebase hits directly, the rest by one model call
+        scores, rows, pending = [], [], []
+        for i, move in enumerate(moves):
+            undo = self.make(move)
+            score = tb_score(self.board, self.color == BLUE)
+            if score is None:
+                rows.append(feature_indices(self.board, self.color))
+                pending.append(i)
+            scores.append(score)
+            self.unmake(undo)
+        if rows:
+            for i, score in zip(pending, EVAL_MODEL.score(learned_eval.one_hot(rows, FEATURES))):
+                scores[i] = score
+        return scores
+
+    def turn(self):
+        return 1 if self.color == BLUE else -1
+
+def play(board, move):
+    # copy of board with a SearchPosition move applied
+    (r, c), dest, skip = move
+    b = board.copy()
+    simulate(b, b.get_piece(r, c), dest, [b.get_piece(sr, sc) for sr, sc in skip])
+    return b
+
+def search(board, depth, max_player, stop=None, deadline=None, on_depth=None):
+    # (value, best move) for the side given by max_player, move as in SearchPosition; board is not modified
+    found = tb_root(board, max_player)
+    if found:
+        return found
+    return SEARCHER.search(SearchPosition(board.copy(), BLUE if max_player else RED), depth, stop, deadline,
+                           on_depth)
+
+# ================= PARALLEL ROOT SEARCH =================
+_shared = {}   # bound / lock / stop, inherited by every pool worker
+
+def _init_root_worker(bound, lock, stop):
+    init_worker()
+    _shared.update(bound=bound, lock=lock, stop=stop)
+
+def _search_root_move(args):
+    child, depth, max_player = args
+    bound, lock, stop = _shared["bound"], _shared["lock"], _shared["stop"]
+    # scores are integers, so searching one point below the best bound still
+    # returns exact values for moves that tie it; search() then takes the first
+    # of the tied moves in move order, as Searcher.root does
+    with lock:
+        best = bound.value
+    pos = SearchPosition(child, RED if max_player else BLUE)
     if max_player:
-        max_eval = -math.inf
-        for p in board.get_all(BLUE):
-            for move, skip in get_moves(board, p).items():
-                b = board.copy()
-                np = b.get_piece(p.row, p.col)
-                simulate(b, np, move, skip)
-                val,_ = minimax(b, depth-1, alpha, beta, False)
-                if val > max_eval:
-                    max_eval, best = val, b
-                alpha = max(alpha, val)
-                if alpha >= beta:
-                    break
-        return max_eval, best
+        val = SEARCHER.value(pos, depth-1, best-1, math.inf, stop)
+        with lock:
+            if val > bound.value:
+                bound.value = val
+    else:
+        val = SEARCHER.value(pos, depth-1, -math.inf, best+1, stop)
+        with lock:
+            if val < bound.value:
+                bound.value = val
+    return val, SEARCHER.stats["nodes"]
+
+class RootSearchPool:
+    # splits the root moves of search() across worker processes sharing the best bound
+    def __init__(self, workers):
+        ctx = multiprocessing.get_context("fork")
+        self.workers = workers
+        self.bound = ctx.Value("d", 0.0, lock=False)
+        self.lock = ctx.Lock()
+        self.stop = ctx.Event()
+        self.pool = ctx.Pool(workers, _init_root_worker, (self.bound, self.lock, self.stop))
+        self.stats = {"nodes": 0, "depth": 0}   # of the last finished search, summed over the workers
+
+    def search(self, board, depth, max_player, stop=None):
+        # (value, move) like search(board, depth, max_player), the root moves shared out over the pool
+        found = tb_root(board, max_player)
+        if found:
+            return found
+        if depth == 0:
+            return search(board, depth, max_player, stop)
+
+        moves = SearchPosition(board, BLUE if max_player else RED).moves()
+        children = [play(board, move) for move in moves]
+        if not children:
+            return (-math.inf if max_player else math.inf), None
+
+        self.bound.value = -math.inf if max_player else math.inf
+        self.stop.clear()
+        result = self.pool.map_async(_search_root_move,
+                                     [(b, depth, max_player) for b in children], chunksize=1)
+        while not result.ready():
+            result.wait(0.05)
+            if stop is not None and stop.is_set():
+                self.stop.set()
+                result.wait()   # let the workers drain so no stale task touches the next bound
+                raise SearchCancelled()
+        values = [value for value, _ in result.get()]
+        self.stats = {"nodes": sum(nodes for _, nodes in result.get()), "depth": depth}
+        best = max(values) if max_player else min(values)
+        return best, moves[values.index(best)]
+
+    def close(self):
+        self.pool.terminate()
+
+# ================= AI TURN =================
+def board_tag(board, color):
+    # one-line picture of the board for profiles: b/r men, B/R kings, then the side to move
+    def square(p):
+        if p is None:
+            return "."
+        letter = "b" if p.color == BLUE else "r"
+        return letter.upper() if p.king else letter
+    rows = ("".join(square(p) for p in row) for row in board.board)
+    return "/".join(rows) + (" BLUE" if color == BLUE else " RED")
+
+def board_from_tag(tag):
+    # (Board, color to move) back from a board_tag() string; ValueError when it is malformed
+    try:
+        rows, side = tag.split()
+        rows = rows.split("/")
+    except ValueError:
+        raise ValueError(f"bad board {tag!r}")
+    if len(rows) != ROWS or any(len(row) != COLS for row in rows) or side not in ("RED", "BLUE"):
+        raise ValueError(f"bad board {tag!r}")
+    board = Board()
+    board.board = [[None]*COLS for _ in range(ROWS)]
+    board.counts = {RED: 0, BLUE: 0}
+    board.score = board.hash = 0
+    for r, row in enumerate(rows):
+        for c, ch in enumerate(row):
+            if ch == ".":
+                continue
+            if ch not in "bBrR":
+                raise ValueError(f"bad square {ch!r} in {tag!r}")
+            p = Piece(r, c, BLUE if ch in "bB" else RED)
+            p.king = ch.isupper()
+            board.board[r][c] = p
+            board.counts[p.color] += 1
+            board.score += PST[p.color, p.king][r][c]
+            board.hash ^= ZOBRIST[p.color, p.king][r][c]
+    return board, (BLUE if side == "BLUE" else RED)
+
+def book_move(board, color):
+    # a SearchPosition move for color from the opening book, None when the position is not in it
+    if BOOK is None or BOOK_MODE == "off":
+        return None
+    pos = SearchPosition(board, color)
+    entries = BOOK.probe(pos.key())
+    if not entries:
+        return None
+    legal = {checkers_book.move_code(move): move for move in pos.moves()}
+    entries = [(legal[code], score) for code, score in entries if code in legal]
+    if not entries:
+        return None
+    best = max(score for _, score in entries)
+    if BOOK_MODE == "best":
+        return next(move for move, score in entries if score == best)
+    weights = [2 ** ((score - best) / BOOK_SPREAD) for _, score in entries]
+    return random.choices([move for move, _ in entries], weights)[0]
+
+# every AI move in play comes through here from SearchWorker, so this is where they get profiled
+@profiled(lambda board, color, mode, stop=None: (board_tag(board, color), AI_DEPTH))
+def choose_move(board, color, mode, stop=None):
+    # board after color's AI move (board itself may be reused), None when color can't move
+    movable = board.legal_moves(color)
+    if not movable:
+        return None
+
+    if mode == "AVA" and color == RED:
+        piece = random.choice(list(movable))
+        moves = movable[piece]
+        move = random.choice(list(moves))
+        return simulate(board, piece, move, moves[move])
+
+    move = book_move(board, color)
+    if move:
+        return play(board, move)
+
+    depth = AI_DEPTH
+    max_player = (color==BLUE)
+    if mode == "AVA" and ROOT_POOL:
+        _, move = ROOT_POOL.search(board, depth, max_player, stop)
     else:
-        min_eval = math.inf
-        for p in board.get_all(RED):
-            for move, skip in get_moves(board, p).items():
-                b = board.copy()
-                np = b.get_piece(p.row, p.col)
-                simulate(b, np, move, skip)
-                val,_ = minimax(b, depth-1, alpha, beta, True)
-                if val < min_eval:
-                    min_eval, best = val, b
-                beta = min(beta, val)
-                if alpha >= beta:
-                    break
-        return min_eval, best
+        _, move = search(board, depth, max_player, stop)
+    return play(board, move) if move else board
+
+class SearchWorker:
+    # runs choose_move on a copy of the board in a background thread so the window stays live
+    def __init__(self, board, color, mode):
+        self.color = color
+        self.result = None
+        self.stop = threading.Event()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(board.copy(), color, mode), daemon=True)
+        self.thread.start()
+
+    def run(self, board, color, mode):
+        try:
+            self.result = choose_move(board, color, mode, self.stop)
+        except SearchCancelled:
+            pass
+        finally:
+            self.done.set()
+            if pygame.display.get_init():
+                pygame.event.post(pygame.event.Event(SEARCH_DONE))
+
+    def cancel(self):
+        self.stop.set()
+        self.thread.join()
+
+def moved(before, after, color):
+    # (from, to) squares of color's move between two Board.view()s, None when nothing moved
+    src = next((cell for cell, (c, _) in before.items() if c == color and after.get(cell, (None,))[0] != color), None)
+    dst = next((cell for cell, (c, _) in after.items() if c == color and before.get(cell, (None,))[0] != color), None)
+    return (src, dst) if src and dst else None
 
 # ================= GAME =================
 class Game:
@@ -168,14 +567,37 @@ class Game:
         self.selected = None
         self.valid_moves = {}
         self.ai_timer = 0
+        self.search = None
+        self.shown = {}   # what each square showed in the last frame
+        self.moves = []   # (from, to) squares of every move, for game_record
 
     def update(self):
-        self.board.draw()
-        self.draw_moves()
-        pygame.display.update()
+        # redraw only the squares whose piece or move marker changed
+        view = self.board.view()
+        for cell in self.valid_moves:
+            view[cell] = GREEN
+        for cell in view.keys() | self.shown.keys():
+            if view.get(cell) != self.shown.get(cell):
+                scheduler.invalidate(cell_rect(*cell))
+        self.shown = view
+        if not scheduler.dirty:
+            return
 
-    def draw_moves(self):
+        rects = scheduler.dirty_rects()
+        if rects is None:
+            scheduler.restore()
+            rects = [screen.get_rect()]
+        else:
+            for rect in rects:
+                scheduler.restore(rect)
+        self.board.draw(rects)
+        self.draw_moves(rects)
+        scheduler.present()
+
+    def draw_moves(self, rects):
         for (r,c) in self.valid_moves:
+            if cell_rect(r, c).collidelist(rects) == -1:
+                continue
             x = c*CELL + CELL // 2
             y = r*CELL + CELL // 2
             pygame.draw.circle(screen, GREEN, (x, y), 12)
@@ -183,15 +605,15 @@ class Game:
     def select(self, r, c):
         piece = self.board.get_piece(r, c)
         if self.selected is None:
-            if piece and piece.color == self.turn and get_moves(self.board, piece):
+            moves = self.board.legal_moves(self.turn).get(piece)
+            if moves:
                 self.selected = piece
-                self.valid_moves = get_moves(self.board, piece)
+                self.valid_moves = moves
             return
 
         if (r,c) in self.valid_moves:
-            self.board.move(self.selected, r, c)
-            for p in self.valid_moves[(r,c)]:
-                self.board.board[p.row][p.col] = None
+            self.moves.append(((self.selected.row, self.selected.col), (r, c)))
+            simulate(self.board, self.selected, (r, c), self.valid_moves[(r,c)])
             self.selected = None
             self.valid_moves = {}
             self.turn = BLUE if self.turn==RED else RED
@@ -200,46 +622,31 @@ class Game:
         self.selected = None
         self.valid_moves = {}
 
-    def ai_move(self, color):
-        pieces = self.board.get_all(color)
-        movable = [p for p in pieces if get_moves(self.board, p)]
-        if not movable:
-            return
+    def start_search(self, color, now):
+        self.search = SearchWorker(self.board, color, self.mode)
+        self.ai_timer = now
 
-        if game.mode == "AVA":
-            if color == BLUE:
-                
-                depth = 3
-                max_player = True
-                _, new_board = minimax(self.board, depth, -math.inf, math.inf, max_player)
-                if new_board:
-                    self.board = new_board
-            else:
-                
-                piece = random.choice(movable)
-                moves = list(get_moves(self.board, piece).keys())
-                if moves:
-                    move = random.choice(moves)
-                    skips = get_moves(self.board, piece)[move]
-                    simulate(self.board, piece, move, skips)
-        else:
-            
-            depth = 3
-            max_player = (color==BLUE)
-            _, new_board = minimax(self.board, depth, -math.inf, math.inf, max_player)
-            if new_board:
-                self.board = new_board
+    def finish_search(self, now):
+        # apply the worker's move once it is ready and the last move has been shown long enough
+        if not self.search.done.is_set() or now - self.ai_timer < AI_DELAY:
+            return
+        search, self.search = self.search, None
+        if search.result is not None:
+            self.moves.append(moved(self.board.view(), search.result.view(), search.color))
+            self.board = search.result
+            self.turn = RED if search.color==BLUE else BLUE
 
-        self.turn = RED if color==BLUE else BLUE
+    def cancel_search(self):
+        if self.search:
+            self.search.cancel()
+            self.search = None
 
     def winner(self):
-        red_pieces = self.board.get_all(RED)
-        blue_pieces = self.board.get_all(BLUE)
-        if not red_pieces: return "BLUE"
-        if not blue_pieces: return "RED"
+        if not self.board.counts[RED]: return "BLUE"
+        if not self.board.counts[BLUE]: return "RED"
 
-        red_moves = any(get_moves(self.board, p) for p in red_pieces)
-        blue_moves = any(get_moves(self.board, p) for p in blue_pieces)
+        red_moves = bool(self.board.legal_moves(RED))
+        blue_moves = bool(self.board.legal_moves(BLUE))
 
         if not red_moves and not blue_moves:
             return "DRAW"
@@ -250,44 +657,61 @@ class Game:
 
 # ================= MENU =================
 def menu():
+    # the mode picked, None when the window is closed
+    buttons = [
+        {"text":"Player vs Player", "rect":pygame.Rect(200, 220, 200, 50), "mode":"PVP"},
+        {"text":"Player vs AI", "rect":pygame.Rect(200, 300, 200, 50), "mode":"PVA"},
+        {"text":"AI vs AI", "rect":pygame.Rect(200, 380, 200, 50), "mode":"AVA"}
+    ]
+    hover = None
+
     while True:
-        screen.fill(GRAY)
-        title = BIG_FONT.render("CHECKERS", 1, YELLOW)
-        screen.blit(title, (WIDTH//2 - title.get_width()//2, 100))
-
-        buttons = [
-            {"text":"Player vs Player", "rect":pygame.Rect(200, 220, 200, 50), "mode":"PVP"},
-            {"text":"Player vs AI", "rect":pygame.Rect(200, 300, 200, 50), "mode":"PVA"},
-            {"text":"AI vs AI", "rect":pygame.Rect(200, 380, 200, 50), "mode":"AVA"}
-        ]
-
-        mouse = pygame.mouse.get_pos()
-        click = pygame.mouse.get_pressed()
-
-        for b in buttons:
-            color = GREEN if b["rect"].collidepoint(mouse) else BLUE
-            pygame.draw.rect(screen, color, b["rect"])
-            text = FONT.render(b["text"], 1, WHITE)
-            screen.blit(text, (b["rect"].x + b["rect"].width//2 - text.get_width()//2,
-                               b["rect"].y + b["rect"].height//2 - text.get_height()//2))
-            if b["rect"].collidepoint(mouse) and click[0]:
-                pygame.time.delay(200)
-                return b["mode"]
-
-        pygame.display.update()
-        for e in pygame.event.get():
+        if scheduler.dirty:
+            screen.fill(GRAY)
+            title = BIG_FONT.render("CHECKERS", 1, YELLOW)
+            screen.blit(title, (WIDTH//2 - title.get_width()//2, 100))
+
+            for b in buttons:
+                color = GREEN if b is hover else BLUE
+                pygame.draw.rect(screen, color, b["rect"])
+                text = FONT.render(b["text"], 1, WHITE)
+                screen.blit(text, (b["rect"].x + b["rect"].width//2 - text.get_width()//2,
+                                   b["rect"].y + b["rect"].height//2 - text.get_height()//2))
+            scheduler.present()
+
+        # the menu only changes when the pointer moves onto or off a button
+        for e in scheduler.wait():
             if e.type==pygame.QUIT:
                 print("Game closed by user.")
-                pygame.quit(); sys.exit()
+                return None
+            if e.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN):
+                over = next((b for b in buttons if b["rect"].collidepoint(e.pos)), None)
+                if over is not hover:
+                    hover = over
+                    scheduler.invalidate()
+                if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1 and over:
+                    pygame.time.delay(200)
+                    return over["mode"]
 
 # ================= MAIN =================
 def main():
-    global game
+    # menu and game, over and over, until the window is closed; then returns, so the launcher gets its window back
+    while play_one():
+        pass
+
+def play_one():
+    # one menu and the game picked there; False when the window was closed
+    global game, screen, scheduler
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Checkers")
+    scheduler = RenderScheduler(screen, 30)
     mode = menu()
+    if mode is None:
+        return False
     game = Game(mode)
+    scheduler.set_background(paint_squares)
 
     while True:
-        clock.tick(30)
         game.update()
 
         winner = game.winner()
@@ -297,32 +721,88 @@ def main():
                 msg_text = "Draw!"
             else:
                 msg_text = f"{winner} Wins!"
+            game_record.write("checkers", "8x8", winner, game.moves, mode=game.mode, depth=AI_DEPTH)
             msg = BIG_FONT.render(msg_text, 1, YELLOW)
             screen.blit(msg, (WIDTH//2 - msg.get_width()//2, HEIGHT//2 - msg.get_height()//2))
             pygame.display.update()
             pygame.time.delay(3000)
-            main()
+            return True
 
         current_time = pygame.time.get_ticks()
+        timeout = None   # sleep until input or SEARCH_DONE
 
-        # AI moves
-        if game.mode == "AVA":
-            if current_time - game.ai_timer > 500:
-                game.ai_move(game.turn)
-                game.ai_timer = current_time
-        elif game.mode == "PVA" and game.turn == BLUE:
-            if current_time - game.ai_timer > 500:
-                game.ai_move(BLUE)
-                game.ai_timer = current_time
+        # AI moves run in the background; the result is applied here on the main loop
+        if game.mode == "AVA" or (game.mode == "PVA" and game.turn == BLUE):
+            if game.search is None:
+                game.start_search(game.turn, current_time)
+            else:
+                game.finish_search(current_time)
+            if game.search is None:
+                timeout = 0   # a move was just applied: go round again to show it
+            elif game.search.done.is_set():
+                # the move is ready but the previous one has not been on screen for AI_DELAY yet
+                timeout = max(1, AI_DELAY - (current_time - game.ai_timer))
 
         # Player moves
-        for e in pygame.event.get():
+        for e in scheduler.wait(timeout):
             if e.type == pygame.QUIT:
                 print("Game closed by user.")
-                pygame.quit(); sys.exit()
+                game.cancel_search()
+                return False
             if e.type == pygame.MOUSEBUTTONDOWN:
                 if game.mode == "PVP" or (game.mode == "PVA" and game.turn == RED):
                     x, y = pygame.mouse.get_pos()
                     game.select(y//CELL, x//CELL)
 
-main()
+# ================= HEADLESS ANALYSIS =================
+def describe(before, after, color):
+    # "r,c -> r,c" for the piece of color that moved between two boards
+    move = moved(before.view(), after.view(), color)
+    return f"{move[0][0]},{move[0][1]} -> {move[1][0]},{move[1][1]}" if move else "?"
+
+def analyze(depth, plies):
+    # AI vs AI from the start position, printing every search without opening a window
+    board = Board()
+    color = RED
+    total = 0.0
+    for ply in range(1, plies + 1):
+        if not board.legal_moves(color):
+            break
+        start = time.perf_counter()
+        if ROOT_POOL:
+            val, move = ROOT_POOL.search(board, depth, color == BLUE)
+        else:
+            val, move = search(board, depth, color == BLUE)
+        new_board = play(board, move)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        name = "BLUE" if color == BLUE else "RED"
+        print(f"{ply:3d} {name:4s} {describe(board, new_board, color):12s} "
+              f"score {val:6} {elapsed*1000:8.1f} ms")
+        board = new_board
+        color = RED if color == BLUE else BLUE
+    print(f"total {total:.2f}s with {ROOT_POOL.workers if ROOT_POOL else 1} worker(s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkers with a minimax AI.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for the root search in AI vs AI mode and --analyze")
+    parser.add_argument("--analyze", action="store_true",
+                        help="play AI vs AI headlessly and print every search")
+    parser.add_argument("--depth", type=int, default=5, help="search depth for --analyze")
+    parser.add_argument("--plies", type=int, default=20, help="plies to play for --analyze")
+    parser.add_argument("--book", choices=["vary", "best", "off"], default=BOOK_MODE,
+                        help="how the AI uses checkers_book.bin in play")
+    args = parser.parse_args()
+    BOOK_MODE = args.book
+
+    if args.workers > 1:
+        ROOT_POOL = RootSearchPool(args.workers)
+    try:
+        if args.analyze:
+            analyze(args.depth, args.plies)
+        else:
+            main()
+    finally:
+        if ROOT_POOL:
+            ROOT_POOL.close()
@@ -1,7 +1,11 @@
 import pygame
 import sys
-import math
-import random
+
+import game_record
+from connect4_search import Connect4Position, analysis_cache, grid_tag
+from game_search import Searcher
+from move_profiler import profiled
+from render_scheduler import RenderScheduler
 
 pygame.init()
 
@@ -20,7 +24,6 @@ TEXT_COLOR = (240, 240, 240)
 
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Connect 4 – Modern AI Edition")
-clock = pygame.time.Clock()
 font = pygame.font.SysFont("arial", 30, bold=True)
 small_font = pygame.font.SysFont("arial", 22)
 
@@ -28,11 +31,7 @@ small_font = pygame.font.SysFont("arial", 22)
 class Connect4:
     def __init__(self):
         self.grid = [[" " for _ in range(COLS)] for _ in range(ROWS)]
-
-    def copy(self):
-        g = Connect4()
-        g.grid = [row[:] for row in self.grid]
-        return g
+        self.searcher = Searcher(store=analysis_cache())
 
     def current_player(self):
         x = sum(row.count('X') for row in self.grid)
@@ -71,66 +70,55 @@ class Connect4:
         return None
 
     # ============================ AI ============================
-    def heuristic(self):
+    def heuristic(self, grid=None):
+        grid = self.grid if grid is None else grid
         score = 0
-        center = [self.grid[r][COLS // 2] for r in range(ROWS)]
+        center = [grid[r][COLS // 2] for r in range(ROWS)]
         score += center.count('X') * 3
         score -= center.count('O') * 3
         return score
 
-    def minimax(self, depth, alpha, beta, maximizing):
-        terminal = self.check_terminal()
-        if terminal is not None or depth == 0:
-            return terminal if terminal is not None else self.heuristic()
-
-        if maximizing:
-            value = -math.inf
-            for col in self.available_cols():
-                g = self.copy()
-                g.drop_piece(col, 'X')
-                value = max(value, g.minimax(depth-1, alpha, beta, False))
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-            return value
-        else:
-            value = math.inf
-            for col in self.available_cols():
-                g = self.copy()
-                g.drop_piece(col, 'O')
-                value = min(value, g.minimax(depth-1, alpha, beta, True))
-                beta = min(beta, value)
-                if alpha >= beta:
-                    break
-            return value
-
+    @profiled(lambda self, depth: (grid_tag(self.grid), depth))
     def best_move(self, depth):
-        player = self.current_player()
-        best_val = -math.inf if player == 'X' else math.inf
-        best_col = random.choice(self.available_cols())
-
-        for col in self.available_cols():
-            g = self.copy()
-            g.drop_piece(col, player)
-            val = g.minimax(depth-1, -math.inf, math.inf, player == 'O')
-            if player == 'X' and val > best_val:
-                best_val, best_col = val, col
-            if player == 'O' and val < best_val:
-                best_val, best_col = val, col
-        return best_col
+        _, col = self.searcher.search(Connect4Position(self.grid, self.heuristic), depth)
+        return col
 
 # ============================ DRAWING ============================
-def draw_board(game, falling=None, info=""):
-    screen.fill(BG_COLOR)
-    pygame.draw.rect(screen, BOARD_COLOR, (0, CELL_SIZE, WIDTH, HEIGHT))
+INFO_RECT = pygame.Rect(0, 0, WIDTH, CELL_SIZE)
+scheduler = RenderScheduler(screen, 60)
+
+def column_rect(c):
+    return pygame.Rect(c * CELL_SIZE, 0, CELL_SIZE, HEIGHT)
 
+def paint_board(surface):
+    # the static layer: background, board and empty holes
+    surface.fill(BG_COLOR)
+    pygame.draw.rect(surface, BOARD_COLOR, (0, CELL_SIZE, WIDTH, HEIGHT))
     for r in range(ROWS):
         for c in range(COLS):
             x = c * CELL_SIZE + CELL_SIZE // 2
             y = (r + 1) * CELL_SIZE + CELL_SIZE // 2
-            color = EMPTY_COLOR
-            if game.grid[r][c] == 'X': color = X_COLOR
-            if game.grid[r][c] == 'O': color = O_COLOR
+            pygame.draw.circle(surface, EMPTY_COLOR, (x, y), RADIUS)
+
+def draw_board(game, falling=None, info=""):
+    # repaint only what was invalidated since the last frame
+    rects = scheduler.dirty_rects()
+    if rects is None:
+        scheduler.restore()
+        rects = [screen.get_rect()]
+    else:
+        for rect in rects:
+            scheduler.restore(rect)
+
+    for c in range(COLS):
+        if column_rect(c).collidelist(rects) == -1:
+            continue
+        for r in range(ROWS):
+            if game.grid[r][c] == " ":
+                continue
+            x = c * CELL_SIZE + CELL_SIZE // 2
+            y = (r + 1) * CELL_SIZE + CELL_SIZE // 2
+            color = X_COLOR if game.grid[r][c] == 'X' else O_COLOR
             pygame.draw.circle(screen, color, (x, y), RADIUS)
 
     if falling:
@@ -139,34 +127,43 @@ def draw_board(game, falling=None, info=""):
         color = X_COLOR if player == 'X' else O_COLOR
         pygame.draw.circle(screen, color, (x, y), RADIUS)
 
-    label = small_font.render(info, True, TEXT_COLOR)
-    screen.blit(label, (10, 10))
-    pygame.display.update()
+    if INFO_RECT.collidelist(rects) != -1:
+        label = small_font.render(info, True, TEXT_COLOR)
+        screen.blit(label, (10, 10))
+    scheduler.present()
 
 # ============================ ANIMATION ============================
 def animate_drop(game, col, row, player, info=""):
+    # the piece is already in the grid; hide it until the falling one lands
+    game.grid[row][col] = " "
+    scheduler.animating += 1
+    scheduler.invalidate(INFO_RECT)
     y = CELL_SIZE // 2
     target_y = (row + 1) * CELL_SIZE + CELL_SIZE // 2
     while y < target_y:
-        y += 25
+        y = min(y + 25, target_y)
+        scheduler.invalidate(column_rect(col))
         draw_board(game, (col, y, player), info)
-        clock.tick(60)
+        scheduler.wait(0)
+    game.grid[row][col] = player
+    scheduler.invalidate(column_rect(col))
+    scheduler.animating -= 1
 
 # ============================ MENU ============================
 def menu():
-    while True:
-        screen.fill(BG_COLOR)
-        title = font.render("CONNECT 4", True, TEXT_COLOR)
-        screen.blit(title, (WIDTH//2 - title.get_width()//2, 120))
-
-        options = ["1 - Human vs Human", "2 - Human vs AI", "3 - AI vs AI", "Press 1 / 2 / 3"]
-        for i, text in enumerate(options):
-            t = small_font.render(text, True, TEXT_COLOR)
-            screen.blit(t, (WIDTH//2 - t.get_width()//2, 220 + i*40))
+    screen.fill(BG_COLOR)
+    title = font.render("CONNECT 4", True, TEXT_COLOR)
+    screen.blit(title, (WIDTH//2 - title.get_width()//2, 120))
 
-        pygame.display.update()
+    options = ["1 - Human vs Human", "2 - Human vs AI", "3 - AI vs AI", "Press 1 / 2 / 3"]
+    for i, text in enumerate(options):
+        t = small_font.render(text, True, TEXT_COLOR)
+        screen.blit(t, (WIDTH//2 - t.get_width()//2, 220 + i*40))
+    scheduler.present()
 
-        for event in pygame.event.get():
+    # nothing on the menu changes, so just sleep until a key arrives
+    while True:
+        for event in scheduler.wait():
             if event.type == pygame.QUIT:
                 pygame.quit(); sys.exit()
             if event.type == pygame.KEYDOWN:
@@ -180,15 +177,19 @@ def main():
     depth = 4
     game = Connect4()
     running = True
+    scheduler.set_background(paint_board)
+    info = ""
+    moves = []   # columns played, for game_record
 
     while running:
-        clock.tick(60)
-        draw_board(game)
+        if scheduler.dirty:
+            draw_board(game, info=info)
 
         player = game.current_player()
         ai_turn = (mode == 3) or (mode == 2 and player == 'O')
 
-        for event in pygame.event.get():
+        # a human turn sleeps until there is input; an AI turn must not block
+        for event in scheduler.wait(0 if ai_turn else None):
             if event.type == pygame.QUIT:
                 pygame.quit(); sys.exit()
 
@@ -196,17 +197,24 @@ def main():
                 col = event.pos[0] // CELL_SIZE
                 if col in game.available_cols():
                     row = game.drop_piece(col, player)
+                    moves.append(col)
+                    info = ""
                     animate_drop(game, col, row, player)
 
         if ai_turn:
+            scheduler.invalidate(INFO_RECT)
             draw_board(game, info="AI thinking...")
             pygame.time.wait(400)
             col = game.best_move(depth)
             row = game.drop_piece(col, player)
-            animate_drop(game, col, row, player, "AI played")
+            moves.append(col)
+            info = "AI played"
+            animate_drop(game, col, row, player, info)
 
         result = game.check_terminal()
         if result is not None:
+            draw_board(game, info=info)
+            game_record.write("connect4", "6x7k4", game_record.CONNECT4_RESULTS[result], moves, mode=mode, depth=depth)
             text = "Draw" if result == 0 else ("X Wins" if result == 1 else "O Wins")
             label = font.render(text, True, TEXT_COLOR)
             screen.blit(label, (WIDTH//2 - label.get_width()//2, 20))
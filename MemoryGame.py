@@ -2,6 +2,10 @@ import tkinter as tk
 from tkinter import messagebox
 import random
 import time
+from collections import OrderedDict
+
+import game_record
+from move_profiler import profiled
 
 WINDOW_SIZE = "500x600"
 BG = "#0f172a"
@@ -11,91 +15,227 @@ TEXT = "#e5e7eb"
 ACCENT = "#22c55e"
 DANGER = "#ef4444"
 
+BOARD_SIZE = 460   # canvas side in pixels; cards shrink to fit bigger boards
+CARD_GAP = 4
+FRAME_MS = 30      # one tick of the shared flip animation
+FLIP_STEPS = 10    # ticks per flip: shrink to the middle, swap faces, grow back
+TURBO_FPS = 30     # board refreshes per second while a turbo game plays itself
+
+# AI difficulty: (cards it can remember, chance per flip of forgetting its oldest card)
+AI_LEVELS = {"Easy": (6, 0.1), "Medium": (12, 0.02), "Hard": (None, 0.0)}
+
 # ================== AI ==================
+# Dynamic program over (n pairs left, k known cards whose partner is unseen).
+# u = 2n - k cards are unseen. With perfect memory on both sides the only
+# sensible turn is to flip an unseen card; if it doesn't complete a known
+# card, the second flip is either another unseen card (may match, may hand
+# the opponent a pair) or a known card (safe, reveals nothing new).
+# value[k] is the expected score difference for the player to move and only
+# two rows of it are alive at a time; explore[n][k] says whether the unseen
+# second flip is the better one and is all the AI needs at play time.
+# From 16 pairs on the table settles into a parity rule (play the known card
+# when n + k is even and k <= n - 2; checked against the full table up to
+# 1500 pairs), so boards bigger than EXACT_PAIRS use the rule directly.
+EXACT_PAIRS = 64
+_POLICY_TABLES = {}
+
+def policy_table(pairs):
+    # tables for more pairs also cover every smaller board
+    for size, explore in _POLICY_TABLES.items():
+        if size >= pairs:
+            return explore
+
+    explore = [bytearray(b"\x01") * (n + 1) for n in range(pairs + 1)]
+    prev = [0.0]
+    for n in range(1, pairs + 1):
+        value = [0.0] * (n + 1)
+        for k in range(n, -1, -1):
+            u = 2 * n - k
+            hit = (k / u) * (1 + prev[k-1]) if k else 0.0
+            if k == n:
+                value[k] = hit
+                continue
+            # first card is new; its partner is one of the other u - 1 unseen cards
+            unseen = (1 + prev[k]
+                      - k * (1 + prev[k])
+                      - (u - 2 - k) * (value[k+2] if k + 2 <= n else 0.0)) / (u - 1)
+            safe = -value[k+1] if k else -float("inf")
+            explore[n][k] = unseen >= safe
+            value[k] = hit + ((u - k) / u) * max(unseen, safe)
+        prev = value
+
+    _POLICY_TABLES[pairs] = explore
+    return explore
+
+class CardMemory:
+    # what an AI knows about the board, with O(1) updates on flip and on match:
+    #   singles: value -> position of a seen card whose partner is still unseen
+    #   ready:   value -> (pos, pos) for pairs where both cards have been seen
+    #   unseen:  positions not remembered (list + index so random picks stay O(1))
+    # value_of is ordered by when a card was last seen. With a capacity the
+    # least recently seen card is forgotten once it is full, and with decay
+    # every new sighting may also make the AI forget its oldest card.
+    def __init__(self, positions, capacity=None, decay=0.0):
+        if capacity is not None and capacity < 2:
+            raise ValueError("AI memory needs room for at least two cards")
+        self.capacity = capacity
+        self.decay = decay
+        self.value_of = OrderedDict()
+        self.singles = {}
+        self.ready = {}
+        self.unseen = list(positions)
+        self.index = {p: i for i, p in enumerate(self.unseen)}
+
+    def _drop_unseen(self, pos):
+        i = self.index.pop(pos)
+        last = self.unseen.pop()
+        if last != pos:
+            self.unseen[i] = last
+            self.index[last] = i
+
+    def _forget(self, pos):
+        value = self.value_of.pop(pos)
+        pair = self.ready.pop(value, None)
+        if pair:
+            self.singles[value] = pair[1] if pair[0] == pos else pair[0]
+        else:
+            del self.singles[value]
+        self.index[pos] = len(self.unseen)
+        self.unseen.append(pos)
+
+    def seen(self, pos, value):
+        if pos in self.value_of:
+            self.value_of.move_to_end(pos)
+            return
+        if pos not in self.index:
+            return
+        self._drop_unseen(pos)
+        self.value_of[pos] = value
+        other = self.singles.pop(value, None)
+        if other is None:
+            self.singles[value] = pos
+        else:
+            self.ready[value] = (other, pos)
+
+        if self.capacity is not None and len(self.value_of) > self.capacity:
+            self._forget(next(iter(self.value_of)))
+        if self.decay and len(self.value_of) > 1 and random.random() < self.decay:
+            self._forget(next(iter(self.value_of)))
+
+    def matched(self, pos1, pos2):
+        for pos in (pos1, pos2):
+            if pos in self.index:
+                self._drop_unseen(pos)
+            value = self.value_of.pop(pos, None)
+            if value is not None:
+                self.ready.pop(value, None)
+                self.singles.pop(value, None)
+
+    def random_unseen(self):
+        return random.choice(self.unseen) if self.unseen else None
+
+    def known_single(self, exclude):
+        # any remembered unmatched card other than exclude
+        for pos in self.singles.values():
+            if pos != exclude:
+                return pos
+        return None
+
 class AIPlayer:
-    def __init__(self, depth=3):
-        self.memory = {} 
-        self.depth = depth
+    def __init__(self, positions, capacity=None, decay=0.0):
+        self.memory = CardMemory(positions, capacity, decay)
+        self.pairs_left = len(self.memory.unseen) // 2
+        self.explore = policy_table(min(self.pairs_left, EXACT_PAIRS))
 
     def remember(self, pos, value):
-        self.memory.setdefault(value, set()).add(pos)
-
-    def evaluate(self, score_diff, known_pairs):
-        return score_diff * 10 + known_pairs * 2
-
-    def minimax(self, available, memory, depth, maximizing, alpha, beta):
-        if depth == 0 or len(available) < 2:
-            known_pairs = sum(1 for v in memory.values() if len(v) >= 2)
-            return self.evaluate(0, known_pairs), None
-
-        best_move = None
-
-        moves = []
-        av = list(available)
-        for i in range(len(av)):
-            for j in range(i + 1, len(av)):
-                moves.append((av[i], av[j]))
-
-        if maximizing:
-            max_eval = -float("inf")
-            for m in moves:
-                eval_score = self.simulate(m, memory, depth, False, alpha, beta)
-                if eval_score > max_eval:
-                    max_eval = eval_score
-                    best_move = m
-                alpha = max(alpha, eval_score)
-                if beta <= alpha:
-                    break
-            return max_eval, best_move
-        else:
-            min_eval = float("inf")
-            for m in moves:
-                eval_score = self.simulate(m, memory, depth, True, alpha, beta)
-                if eval_score < min_eval:
-                    min_eval = eval_score
-                    best_move = m
-                beta = min(beta, eval_score)
-                if beta <= alpha:
-                    break
-            return min_eval, best_move
-
-    # ---------------- SIMULATION ----------------
-    def simulate(self, move, memory, depth, maximizing, alpha, beta):
-        new_memory = {k: set(v) for k, v in memory.items()}
-
-        for pos in move:
-            for v, poses in new_memory.items():
-                if pos in poses:
-                    break
-            else:
-                new_memory.setdefault("?", set()).add(pos)
+        self.memory.seen(pos, value)
 
-        score_diff = 1 if maximizing else -1
-        eval_score, _ = self.minimax(
-            set(), new_memory, depth - 1, maximizing, alpha, beta
-        )
-        return eval_score + score_diff
+    def matched(self, pos1, pos2):
+        self.memory.matched(pos1, pos2)
+        self.pairs_left -= 1
 
     # ---------------- PUBLIC MOVE ----------------
-    def choose(self, available):
-        for value, poses in self.memory.items():
-            valid = [p for p in poses if p in available]
-            if len(valid) >= 2:
-                return valid[0], valid[1]
-
-        _, move = self.minimax(
-            available,
-            self.memory,
-            self.depth,
-            True,
-            -float("inf"),
-            float("inf"),
-        )
-
-        if move:
-            return move
-
-        return random.sample(list(available), 2)
+    @profiled(lambda self, first=None: (f"pairs={self.pairs_left} singles={len(self.memory.singles)} "
+                                        f"ready={len(self.memory.ready)} first={first}", 0))
+    def choose(self, first=None):
+        # next card to flip; call again with first= once the first card is face up
+        memory = self.memory
+        if first is None:
+            if memory.ready:
+                return next(iter(memory.ready.values()))[0]
+            pos = memory.random_unseen()
+            return pos if pos is not None else memory.known_single(None)
+
+        value = memory.value_of.get(first)
+        pair = memory.ready.get(value)
+        if pair:
+            return pair[1] if pair[0] == first else pair[0]
+
+        n = self.pairs_left
+        known = len(memory.singles) - 1   # known cards besides the one just flipped
+        if n <= EXACT_PAIRS:
+            explore = self.explore[n][known]
+        else:
+            explore = not (known <= n - 2 and (n + known) % 2 == 0)
+        if known > 0 and not explore:
+            return memory.known_single(first)
+        pos = memory.random_unseen()
+        return pos if pos is not None else memory.known_single(first)
+
+# ================== MODEL ==================
+# the rules of one game with no tkinter involved, so games can also be played headlessly
+class MemoryState:
+    def __init__(self, rows, cols, values=None):
+        self.rows, self.cols = rows, cols
+        self.total_pairs = (rows * cols) // 2
+        if values is None:
+            values = list(range(1, self.total_pairs + 1)) * 2
+            random.shuffle(values)
+        self.values = {(r, c): values[r * cols + c] for r in range(rows) for c in range(cols)}
+        self.matched = set()
+        self.turn = 1
+        self.scores = {1: 0, 2: 0}
+        self.first = self.second = None
+        self.turns = 0
+        self.flips = []   # card index r * cols + c of every flip, for game_record
+
+    def can_flip(self, pos):
+        return self.second is None and pos != self.first and pos not in self.matched
+
+    def flip(self, pos):
+        self.flips.append(pos[0] * self.cols + pos[1])
+        if self.first is None:
+            self.first = pos
+        else:
+            self.second = pos
+        return self.values[pos]
+
+    def resolve(self):
+        # settle the two face-up cards; True on a match (the same player goes again)
+        match = self.values[self.first] == self.values[self.second]
+        if match:
+            self.scores[self.turn] += 1
+            self.matched.update((self.first, self.second))
+        else:
+            self.turn = 2 if self.turn == 1 else 1
+        self.first = self.second = None
+        self.turns += 1
+        return match
+
+    def over(self):
+        return sum(self.scores.values()) == self.total_pairs
+
+    def winner(self):
+        # 1 or 2, 0 for a draw
+        if self.scores[1] == self.scores[2]:
+            return 0
+        return 1 if self.scores[1] > self.scores[2] else 2
+
+    def record(self, **info):
+        # append the finished game to the Memory game records
+        deal = [self.values[r, c] for r in range(self.rows) for c in range(self.cols)]
+        return game_record.write("memory", game_record.deal_variant(self.rows, self.cols, deal),
+                                 str(self.winner()), self.flips, **info)
 
 # ================== GAME ==================
 class MemoryGame:
@@ -108,6 +248,8 @@ class MemoryGame:
 
         self.mode = tk.StringVar(value="PVP")
         self.size = tk.StringVar(value="4x4")
+        self.level = tk.StringVar(value="Hard")
+        self.turbo = tk.BooleanVar(value=False)
 
         self.game_id = 0
         self.menu_screen()
@@ -141,13 +283,31 @@ class MemoryGame:
                  fg=ACCENT, bg=BG,
                  font=("Arial", 14, "bold")).pack(pady=(10, 0))
 
-        for text, val in [("4 x 4", "4x4"), ("6 x 6", "6x6")]:
+        for text, val in [("4 x 4", "4x4"), ("6 x 6", "6x6"),
+                          ("8 x 8", "8x8"), ("10 x 10", "10x10")]:
             tk.Radiobutton(frame, text=text, value=val,
                            variable=self.size,
                            fg=TEXT, bg=BG,
                            selectcolor="#020617",
                            font=("Arial", 12)).pack(anchor="w", padx=80)
 
+        tk.Label(frame, text="AI Memory",
+                 fg=ACCENT, bg=BG,
+                 font=("Arial", 14, "bold")).pack(pady=(10, 0))
+
+        for level in AI_LEVELS:
+            tk.Radiobutton(frame, text=level, value=level,
+                           variable=self.level,
+                           fg=TEXT, bg=BG,
+                           selectcolor="#020617",
+                           font=("Arial", 12)).pack(anchor="w", padx=80)
+
+        tk.Checkbutton(frame, text="Turbo (Computer vs Computer)",
+                       variable=self.turbo,
+                       fg=TEXT, bg=BG,
+                       selectcolor="#020617",
+                       font=("Arial", 12)).pack(pady=(10, 0))
+
         tk.Button(frame, text="Start Game",
                   bg=ACCENT, fg="black",
                   font=("Arial", 14, "bold"),
@@ -159,25 +319,24 @@ class MemoryGame:
         self.game_id += 1
         self.clear()
 
-        self.rows, self.cols = (4, 4) if self.size.get() == "4x4" else (6, 6)
-        self.total_pairs = (self.rows * self.cols) // 2
-
-        self.turn = 1
-        self.scores = {1: 0, 2: 0}
-        self.first = self.second = None
-        self.lock = False
-
-        self.ai1 = AIPlayer()
-        self.ai2 = AIPlayer()
+        self.rows, self.cols = map(int, self.size.get().split("x"))
+        self.state = MemoryState(self.rows, self.cols)
 
         self.timer_start = time.time()
 
         self.top_ui()
         self.create_board()
+
+        capacity, decay = AI_LEVELS[self.level.get()]
+        self.ai1 = AIPlayer(self.cards, capacity, decay)
+        self.ai2 = AIPlayer(self.cards, capacity, decay)
         self.update_timer(self.game_id)
 
         if self.mode.get() == "CVC":
-            self.root.after(800, self.ai_move, self.game_id)
+            if self.turbo.get():
+                self.root.after(1, self.turbo_step, self.game_id)
+            else:
+                self.root.after(800, self.ai_move, self.game_id)
 
     # ================= TOP UI =================
     def top_ui(self):
@@ -214,83 +373,140 @@ class MemoryGame:
                   command=self.menu_screen).pack(side="left", padx=5)
 
     # ================= BOARD =================
+    # every card is a rectangle and a text item on one canvas; clicks are
+    # mapped back to cards by coordinates
     def create_board(self):
-        self.board = tk.Frame(self.root, bg=BG)
-        self.board.pack(pady=10)
-
-        values = list(range(1, self.total_pairs + 1)) * 2
-        random.shuffle(values)
+        self.cell = BOARD_SIZE // max(self.rows, self.cols)
+        self.canvas = tk.Canvas(self.root, bg=BG, highlightthickness=0,
+                                width=self.cell * self.cols,
+                                height=self.cell * self.rows)
+        self.canvas.pack(pady=10)
+        self.canvas.bind("<Button-1>", self.click)
 
         self.cards = {}
-        idx = 0
+        self.flipping = {}
+        font = ("Arial", max(8, self.cell // 5), "bold")
 
         for r in range(self.rows):
             for c in range(self.cols):
-                btn = tk.Button(self.board, text="",
-                                width=6, height=3,
-                                bg=CARD_BACK,
-                                font=("Arial", 16, "bold"),
-                                command=lambda p=(r, c): self.flip(p))
-                btn.grid(row=r, column=c, padx=4, pady=4)
+                box = (c * self.cell + CARD_GAP, r * self.cell + CARD_GAP,
+                       (c + 1) * self.cell - CARD_GAP, (r + 1) * self.cell - CARD_GAP)
+                rect = self.canvas.create_rectangle(*box, fill=CARD_BACK, outline="")
+                text = self.canvas.create_text((box[0] + box[2]) / 2, (box[1] + box[3]) / 2,
+                                               text="", fill="black", font=font)
                 self.cards[(r, c)] = {
-                    "value": values[idx],
-                    "btn": btn,
+                    "value": self.state.values[(r, c)],
+                    "box": box,
+                    "rect": rect,
+                    "text": text,
                     "open": False
                 }
-                idx += 1
+
+    def click(self, event):
+        pos = (event.y // self.cell, event.x // self.cell)
+        if pos in self.cards:
+            self.flip(pos)
 
     # ================= ANIMATION =================
-    def animate_flip(self, pos, show=True, step=0):
+    # all cards that are turning share one timer; each tick advances every one
+    def animate_flip(self, pos, show=True):
+        if not self.flipping:
+            self.root.after(FRAME_MS, self.animate_tick, self.game_id)
+        self.flipping[pos] = [show, 0]
+
+    def animate_tick(self, gid):
+        if gid != self.game_id:
+            return
+
+        half = FLIP_STEPS // 2
+        for pos, state in list(self.flipping.items()):
+            show, step = state
+            step += 1
+            state[1] = step
+            card = self.cards[pos]
+
+            if step > FLIP_STEPS:
+                card["open"] = show
+                del self.flipping[pos]
+                continue
+            if step == half + 1:
+                self.set_face(pos, show)
+
+            x0, y0, x1, y1 = card["box"]
+            width = abs(half - step) + 1          # half+1 ... 1 ... half+1
+            inset = (x1 - x0) * (1 - width / (half + 1)) / 2
+            self.canvas.coords(card["rect"], x0 + inset, y0, x1 - inset, y1)
+
+        if self.flipping:
+            self.root.after(FRAME_MS, self.animate_tick, gid)
+
+    def set_face(self, pos, show):
         card = self.cards[pos]
-        btn = card["btn"]
-
-        if step <= 5:
-            btn.config(width=6-step)
-            self.root.after(30, self.animate_flip, pos, show, step+1)
-        elif step <= 10:
-            if show:
-                btn.config(text=str(card["value"]), bg=CARD_FRONT)
-            else:
-                btn.config(text="", bg=CARD_BACK)
-            btn.config(width=step-4)
-            self.root.after(30, self.animate_flip, pos, show, step+1)
+        self.canvas.itemconfig(card["rect"], fill=CARD_FRONT if show else CARD_BACK)
+        self.canvas.itemconfig(card["text"], text=str(card["value"]) if show else "")
+
+    # ================= TURBO =================
+    # Computer vs Computer without delays or animations: play AI turns back
+    # to back for one frame's worth of time, then repaint what changed and
+    # give tkinter a moment to draw and handle events
+    def turbo_step(self, gid):
+        if gid != self.game_id:
+            return
+
+        deadline = time.perf_counter() + 1 / TURBO_FPS
+        state = self.state
+        while not state.over() and time.perf_counter() < deadline:
+            ai = self.ai2 if state.turn == 2 else self.ai1
+            first = None
+            for _ in range(2):
+                pos = ai.choose(first)
+                value = state.flip(pos)
+                self.ai1.remember(pos, value)
+                self.ai2.remember(pos, value)
+                first = pos
+
+            a, b = state.first, state.second
+            if state.resolve():
+                self.ai1.matched(a, b)
+                self.ai2.matched(a, b)
+                for pos in (a, b):
+                    self.set_face(pos, True)
+                    self.cards[pos]["open"] = True
+
+        self.update_labels()
+        if state.over():
+            self.check_end()
         else:
-            card["open"] = show
+            self.root.after(1, self.turbo_step, gid)
 
     # ================= GAME LOGIC =================
     def flip(self, pos):
-        if self.lock or self.cards[pos]["open"]:
+        if self.cards[pos]["open"] or not self.state.can_flip(pos):
             return
 
         self.animate_flip(pos, True)
 
-        self.ai1.remember(pos, self.cards[pos]["value"])
-        self.ai2.remember(pos, self.cards[pos]["value"])
+        value = self.state.flip(pos)
+        self.ai1.remember(pos, value)
+        self.ai2.remember(pos, value)
 
-        if not self.first:
-            self.first = pos
-        else:
-            self.second = pos
-            self.lock = True
+        if self.state.second is not None:
             self.root.after(700, self.check)
 
     def check(self):
-        c1 = self.cards[self.first]
-        c2 = self.cards[self.second]
+        first, second = self.state.first, self.state.second
 
-        if c1["value"] == c2["value"]:
-            self.scores[self.turn] += 1
+        if self.state.resolve():
+            self.ai1.matched(first, second)
+            self.ai2.matched(first, second)
         else:
-            self.animate_flip(self.first, False)
-            self.animate_flip(self.second, False)
-            self.turn = 2 if self.turn == 1 else 1
+            self.animate_flip(first, False)
+            self.animate_flip(second, False)
 
-        self.first = self.second = None
-        self.lock = False
         self.update_labels()
         self.check_end()
 
-        if self.mode.get() == "CVC" or (self.mode.get() == "PVC" and self.turn == 2):
+        if self.mode.get() == "CVC" or (self.mode.get() == "PVC" and self.state.turn == 2):
             self.root.after(600, self.ai_move, self.game_id)
 
     # ================= AI =================
@@ -298,21 +514,20 @@ class MemoryGame:
         if gid != self.game_id:
             return
 
-        available = {p for p, v in self.cards.items() if not v["open"]}
-        if len(available) < 2:
+        if self.state.over():
             return
 
-        ai = self.ai2 if self.turn == 2 else self.ai1
-        p1, p2 = ai.choose(available)
+        ai = self.ai2 if self.state.turn == 2 else self.ai1
+        p1 = ai.choose()
 
         self.flip(p1)
-        self.root.after(400, lambda: self.flip(p2))
+        self.root.after(400, lambda: self.flip(ai.choose(p1)))
 
     # ================= UTILS =================
     def update_labels(self):
-        self.info.config(text=f"Player {self.turn} Turn")
-        self.s1.config(text=f"P1: {self.scores[1]}")
-        self.s2.config(text=f"P2: {self.scores[2]}")
+        self.info.config(text=f"Player {self.state.turn} Turn")
+        self.s1.config(text=f"P1: {self.state.scores[1]}")
+        self.s2.config(text=f"P2: {self.state.scores[2]}")
 
     def update_timer(self, gid):
         if gid != self.game_id:
@@ -321,12 +536,9 @@ class MemoryGame:
         self.root.after(1000, self.update_timer, gid)
 
     def check_end(self):
-        if sum(self.scores.values()) == self.total_pairs:
-            msg = "Draw!"
-            if self.scores[1] > self.scores[2]:
-                msg = "Player 1 Wins 🎉"
-            elif self.scores[2] > self.scores[1]:
-                msg = "Player 2 Wins 🎉"
+        if self.state.over():
+            self.state.record(mode=self.mode.get(), level=self.level.get())
+            msg = ["Draw!", "Player 1 Wins 🎉", "Player 2 Wins 🎉"][self.state.winner()]
             messagebox.showinfo("Game Over", msg)
 
     def clear(self):
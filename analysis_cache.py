@@ -0,0 +1,92 @@
+"""Persistent position analysis for game_search.
+
+An SQLite file of transposition-table entries (key, depth, value, bound,
+best move) that outlives the game. A Searcher given a store loads every
+entry into its table when it is created and writes back the entries it
+searched at least min_depth plies deep, one transaction per search. Once
+the file grows past max_bytes the shallowest entries are deleted first.
+
+Keys must be integers below 2**64, values integers (or infinite) and
+moves JSON values (lists come back as tuples). tag names what the
+values mean, typically the evaluation; a file written under another tag
+is emptied on open.
+"""
+import json
+import sqlite3
+
+SIGN = 1 << 63   # SQLite integers are signed 64-bit
+EVICT_TO = 0.75  # eviction keeps about this share of max_bytes worth of entries
+
+def tuplify(value):
+    if isinstance(value, list):
+        return tuple(tuplify(v) for v in value)
+    return value
+
+class AnalysisCache:
+    def __init__(self, path, tag, min_depth=3, max_bytes=32 << 20):
+        self.path = path
+        self.min_depth = min_depth
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS positions (
+                key INTEGER PRIMARY KEY, depth INTEGER, value INTEGER, flag INTEGER, move TEXT);
+            CREATE INDEX IF NOT EXISTS positions_depth ON positions (depth);
+        """)
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'tag'").fetchone()
+        if row is None or row[0] != tag:
+            with self.db:
+                self.db.execute("DELETE FROM positions")
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('tag', ?)", (tag,))
+
+    def load(self):
+        # {key: (depth, value, flag, move)} for every stored position
+        table = {}
+        for key, depth, value, flag, move in self.db.execute("SELECT * FROM positions"):
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)   # a file from before the column was INTEGER, or a -0.0
+            table[key + SIGN] = (depth, value, flag, tuplify(json.loads(move)))
+        return table
+
+    def save(self, entries):
+        # entries: [(key, (depth, value, flag, move))]; a shallower result never replaces a deeper one
+        if not entries:
+            return
+        rows = [(key - SIGN, depth, value, flag, json.dumps(move))
+                for key, (depth, value, flag, move) in entries]
+        with self.db:
+            self.db.executemany("""
+                INSERT INTO positions VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    depth = excluded.depth, value = excluded.value,
+                    flag = excluded.flag, move = excluded.move
+                WHERE excluded.depth >= positions.depth""", rows)
+        if self.used_bytes() > self.max_bytes:
+            self.evict()
+
+    def used_bytes(self):
+        page_size = self.db.execute("PRAGMA page_size").fetchone()[0]
+        pages = self.db.execute("PRAGMA page_count").fetchone()[0]
+        free = self.db.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def evict(self):
+        # drop the shallowest entries, sized from the average row so about EVICT_TO of
+        # max_bytes stays live; freed pages stay in the file and are reused by later writes
+        count = self.db.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        keep = int(count * EVICT_TO * self.max_bytes / max(self.used_bytes(), 1))
+        with self.db:
+            self.db.execute("""
+                DELETE FROM positions WHERE key IN (
+                    SELECT key FROM positions ORDER BY depth LIMIT ?)""", (max(count - keep, 0),))
+
+    def close(self):
+        self.db.close()
+
+def open_cache(path, tag, **options):
+    # the cache is optional: without a usable file the searcher just keeps its table in memory
+    try:
+        return AnalysisCache(path, tag, **options)
+    except (sqlite3.Error, OSError):
+        return None
@@ -0,0 +1,200 @@
+"""Batch analysis of recorded games (see game_record.py).
+
+    python analyze_records.py game_records/*.rec --workers 4 --budget 0.5 > analysis.jsonl
+
+Reads the record files line by line and splits every game into the
+positions before each move. A process pool then evaluates those
+positions, and one JSON line per move is written to stdout, in record
+order:
+
+    {"file": ..., "line": 3, "game": "connect4", "ply": 7, "side": "X", "move": 2,
+     "best": 3, "best_value": 9979, "played_value": 4, "loss": 9975, "depth": 8,
+     "best_result": "win", "played_result": null, "blunder": true}
+
+Connect 4 and Checkers positions are searched by game_search up to
+--depth plies and for at most --budget seconds each. The budget is split
+between finding the best move and scoring the one played. loss is what
+the played move gave up, from the mover's point of view. best_result and
+played_result are "win" or "loss" for the mover when the search saw the
+game end that way (a Connect 4 line or a Checkers tablebase result), null
+otherwise. A move that makes the result worse, such as a win let go or a
+loss walked into, is a blunder, and so is a move losing at least
+--blunder points (by default 3 for Connect 4 and 50 for Checkers) where
+neither result is known. Memory flips are checked against perfect recall
+instead: a blunder is a flip that misses a pair the player had already
+seen.
+
+At most --pending positions are in flight, so memory stays bounded
+however many records the files hold. Malformed records get an "error"
+line and the run goes on.
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import game_record
+from game_search import finite, init_worker
+
+DEPTH = {"connect4": 8, "checkers": 6}
+BLUNDER = {"connect4": 3, "checkers": 50}
+RANK = {"win": 1, None: 0, "loss": -1}
+
+def result(value, win):
+    # "win" / "loss" when value, from the mover's point of view, is a game the search saw end
+    return "win" if value >= win else "loss" if value <= -win else None
+
+# ================= WORKERS =================
+_searcher = None   # one per worker process, so the table carries over between positions
+
+def analyze_connect4(job):
+    global _searcher
+    from connect4_search import CONNECT, WIN, Connect4Position, centre_heuristic
+    from game_search import Searcher
+    variant, before, move, depth, budget = job
+    if _searcher is None:
+        _searcher = Searcher()
+    size, _, k = variant.partition("k")
+    rows, cols = map(int, size.split("x"))
+    pos = Connect4Position([[" "] * cols for _ in range(rows)], centre_heuristic, int(k or CONNECT))
+    for col in before + [move]:
+        if pos.terminal() is not None or col not in pos.columns():
+            return {"error": f"column {col} is not playable"}
+        pos.make(col)
+    pos.unmake(move)
+    sign = pos.turn()
+    side = pos.player
+    best_value, best = _searcher.search(pos, depth, deadline=time.perf_counter() + budget / 2)
+    reached = _searcher.stats["depth"]
+    pos.make(move)
+    played_value, _ = _searcher.search(pos, depth - 1, deadline=time.perf_counter() + budget / 2)
+    best_value, played_value = finite(best_value), finite(played_value)
+    return {"side": side, "move": move, "best": best, "best_value": best_value,
+            "played_value": played_value, "loss": sign * (best_value - played_value), "depth": reached,
+            "best_result": result(sign * best_value, WIN // 2), "played_result": result(sign * played_value, WIN // 2)}
+
+def analyze_checkers(job):
+    import Checkers
+    before, move, depth, budget = job
+    board, color = Checkers.Board(), Checkers.RED
+    for ply, step in enumerate(before + [move]):
+        found = [m for m in Checkers.SearchPosition(board, color).moves() if m[:2] == step]
+        if not found:
+            return {"error": f"{step} is not a legal move"}
+        if ply == len(before):
+            break
+        board = Checkers.play(board, found[0])
+        color = Checkers.BLUE if color == Checkers.RED else Checkers.RED
+    played = found[0]
+    max_player = color == Checkers.BLUE
+    best_value, best = Checkers.search(board, depth, max_player, deadline=time.perf_counter() + budget / 2)
+    reached = Checkers.SEARCHER.stats["depth"]
+    played_value, _ = Checkers.search(Checkers.play(board, played), depth - 1, not max_player,
+                                      deadline=time.perf_counter() + budget / 2)
+    sign = 1 if max_player else -1
+    best_value, played_value = finite(best_value), finite(played_value)
+    return {"side": "BLUE" if max_player else "RED", "move": list(move), "best": list(best[:2]),
+            "best_value": best_value, "played_value": played_value,
+            "loss": sign * (best_value - played_value), "depth": reached,
+            "best_result": result(sign * best_value, Checkers.TB_WIN // 2),
+            "played_result": result(sign * played_value, Checkers.TB_WIN // 2)}
+
+def analyze_memory(job):
+    # every flip of one game against what a player with perfect recall knew at the time
+    from MemoryGame import CardMemory, MemoryState
+    variant, flips = job
+    rows, cols, values = game_record.parse_deal(variant)
+    state = MemoryState(rows, cols, values)
+    memory = CardMemory(list(state.values))
+    out = []
+    for idx in flips:
+        pos = divmod(idx, cols)
+        if pos not in state.values or not state.can_flip(pos):
+            out.append({"error": f"card {idx} can't be flipped"})
+            break
+        if state.first is None:
+            pair = next(iter(memory.ready.values()), None)   # a pair seen before: flip it
+            best = pair[0] if pair else None
+            good = pair is None or any(pos in p for p in memory.ready.values())
+        else:
+            pair = memory.ready.get(state.values[state.first])   # the first card's partner, if seen
+            best = (pair[1] if pair[0] == state.first else pair[0]) if pair else None
+            good = pair is None or pos == best
+        out.append({"side": state.turn, "move": idx, "best": None if best is None else best[0] * cols + best[1],
+                    "blunder": not good})
+        memory.seen(pos, state.flip(pos))
+        if state.second is not None:
+            a, b = state.first, state.second
+            if state.resolve():
+                memory.matched(a, b)
+    return out
+
+# ================= STREAMING =================
+def jobs(paths, depth, budget):
+    # (what to print with the result, worker, job) for every move of every record, lazily
+    for path, number, record in game_record.read(paths):
+        where = {"file": path, "line": number}
+        if isinstance(record, ValueError):
+            yield dict(where, error=str(record)), None, None
+            continue
+        where["game"] = record.game
+        if record.game == "memory":
+            yield where, analyze_memory, (record.variant, record.moves)
+            continue
+        worker = analyze_connect4 if record.game == "connect4" else analyze_checkers
+        d = depth or DEPTH[record.game]
+        for ply, move in enumerate(record.moves):
+            job = ((record.variant, record.moves[:ply], move, d, budget) if record.game == "connect4"
+                   else (record.moves[:ply], move, d, budget))
+            yield dict(where, ply=ply + 1), worker, job
+
+def emit(where, result, blunder, out):
+    for ply, item in enumerate(result if isinstance(result, list) else [result], 1):
+        line = dict(where)
+        if isinstance(result, list):
+            line["ply"] = ply
+        line.update(item)
+        if "loss" in item:
+            best, played = item["best_result"], item["played_result"]
+            if best or played:
+                line["blunder"] = RANK[played] < RANK[best]
+            else:
+                line["blunder"] = item["loss"] >= (blunder or BLUNDER[where["game"]])
+        out.write(json.dumps(line) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate every move of recorded games.")
+    parser.add_argument("files", nargs="+", help="record files written by game_record")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--depth", type=int, help="search depth (default 8 for Connect 4, 6 for Checkers)")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds of search per position")
+    parser.add_argument("--blunder", type=float, help="points a move may lose before it is a blunder, while the result is open")
+    parser.add_argument("--pending", type=int, default=256, help="most positions in flight at once")
+    args = parser.parse_args()
+
+    out = sys.stdout
+    pending = collections.deque()
+    with multiprocessing.Pool(args.workers, init_worker) as pool:
+        for where, worker, job in jobs(args.files, args.depth, args.budget):
+            if worker is None:
+                pending.append((where, None))
+            else:
+                pending.append((where, pool.apply_async(worker, (job,))))
+            while len(pending) >= args.pending or (pending and pending[0][1] is None):
+                where, result = pending.popleft()
+                if result is None:
+                    out.write(json.dumps(where) + "\n")
+                else:
+                    emit(where, result.get(), args.blunder, out)
+        while pending:
+            where, result = pending.popleft()
+            if result is None:
+                out.write(json.dumps(where) + "\n")
+            else:
+                emit(where, result.get(), args.blunder, out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Opening book for Checkers.py.
+
+Build it once offline:
+
+    python checkers_book.py --plies 6 --depth 7 --out checkers_book.bin
+
+Starting from Board.create(), every move of every book position is
+searched --depth plies deep. The --width best moves within --margin
+points of the best are kept and their positions are expanded in turn,
+for --plies plies. Both sides are covered, and transpositions are stored
+once.
+
+Positions are keyed by Checkers.SearchPosition.key() (the board's zobrist
+hash with the side to move), and scores are from the mover's point of
+view.
+
+File layout (little endian):
+    header   "CKBK", u16 version, u16 plies, u32 count
+    records  count x (u64 key, u16 move, i16 score), sorted by key
+
+A move is from_square * 32 + to_square, squares being the 32 dark
+squares numbered row by row (r * 4 + c // 2).
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+from checkers_tablebase import rc_square
+
+MAGIC = b"CKBK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+RECORD = struct.Struct("<QHh")
+SCORE_LIMIT = 32000   # tablebase wins are clamped into an i16
+
+def move_code(move):
+    # a Checkers.SearchPosition move as stored in the book
+    start, end, _ = move
+    return rc_square(*start) * 32 + rc_square(*end)
+
+# ================= GENERATION =================
+def generate(plies, depth, margin, width, out, verbose=True):
+    import Checkers
+    book = {}   # key -> [(move code, score)]
+    frontier = [(Checkers.Board(), Checkers.RED)]
+    start = time.time()
+    for ply in range(plies):
+        following = []
+        for board, color in frontier:
+            pos = Checkers.SearchPosition(board, color)
+            key = pos.key()
+            if key in book:
+                continue
+            other = Checkers.BLUE if color == Checkers.RED else Checkers.RED
+            sign = 1 if color == Checkers.BLUE else -1
+            scored = []
+            for move in pos.moves():
+                child = Checkers.play(board, move)
+                value = Checkers.SEARCHER.value(Checkers.SearchPosition(child, other), depth - 1)
+                scored.append((sign * value, move, child))
+            if not scored:
+                continue
+            scored.sort(key=lambda s: -s[0])   # stable, so equal scores keep the move order
+            best = scored[0][0]
+            good = [(score, move, child) for score, move, child in scored[:width] if score >= best - margin]
+            book[key] = [(move_code(move), max(-SCORE_LIMIT, min(SCORE_LIMIT, score))) for score, move, _ in good]
+            following += [(child, other) for _, _, child in good]
+        frontier = following
+        if verbose:
+            print(f"ply {ply + 1}: {len(book)} positions ({time.time() - start:.1f}s)")
+
+    records = sorted((key, code, score) for key, moves in book.items() for code, score in moves)
+    with open(out, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, plies, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    if verbose:
+        print(f"wrote {out}: {len(book)} positions, {len(records)} moves, {os.path.getsize(out)} bytes")
+
+# ================= PROBING =================
+class Book:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} checkers opening book")
+
+    def probe(self, key):
+        # [(move code, score)] stored for key, [] when the position is not in the book
+        lo, hi = 0, self.count
+        data = self.data
+        while lo < hi:   # first record with a key >= key
+            mid = (lo + hi) // 2
+            if struct.unpack_from("<Q", data, HEADER.size + RECORD.size * mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        moves = []
+        for i in range(lo, self.count):
+            k, code, score = RECORD.unpack_from(data, HEADER.size + RECORD.size * i)
+            if k != key:
+                break
+            moves.append((code, score))
+        return moves
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+def load(path):
+    # the book is optional: without it every move is searched
+    if not os.path.exists(path):
+        return None
+    return Book(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Checkers opening book.")
+    parser.add_argument("--plies", type=int, default=6, help="plies from the start position (default 6)")
+    parser.add_argument("--depth", type=int, default=7, help="search depth per move (default 7)")
+    parser.add_argument("--margin", type=int, default=15,
+                        help="keep moves this many points below the best (a man is 100)")
+    parser.add_argument("--width", type=int, default=3, help="most moves kept per position (default 3)")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "checkers_book.bin"))
+    args = parser.parse_args()
+    if args.plies < 1 or args.depth < 1:
+        sys.exit("--plies and --depth must be at least 1")
+    generate(args.plies, args.depth, args.margin, args.width, args.out)
@@ -0,0 +1,132 @@
+"""Perft for Checkers.py: move-generator node counts and speed.
+
+    python checkers_perft.py                 start position and the stored positions, depth 1..5
+    python checkers_perft.py --depth 7 --position start
+
+Counts the leaf nodes of the full move tree at depths 1..N. Each position
+is counted three ways, and all three must agree:
+    search   SearchPosition moves/make/unmake, the path game_search walks
+    play     Board.legal_moves plus play() (copy and simulate), the GUI path
+    masks    checkers_tablebase.successors, a separate bitboard generator
+
+Counts are also checked against the ones stored in POSITIONS, so a new
+move generator must reproduce them exactly. Every run appends its node
+counts and nodes per second to checkers_perft.tsv, so speed changes in
+the move path show up between commits. The exit status is 1 on any
+mismatch.
+"""
+import argparse
+import os
+import sys
+import time
+
+import checkers_tablebase
+import Checkers
+from Checkers import BLUE, RED, SearchPosition, board_from_tag, play
+
+RECORD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkers_perft.tsv")
+
+# (name, board_tag, leaf counts at depth 1, 2, ...); the start position is Board.create()
+POSITIONS = [
+    ("start", None,
+     [7, 49, 379, 2872, 23582, 189143, 1585096]),
+    ("mid", ".b...b.b/b.b.b.b./...b.b.b/......r./.b...r../r.r.b.../.r.r.r.r/r...r.r. RED",
+     [7, 51, 390, 3089, 24714, 203698]),
+    ("kings", ".b.....b/b.R.b.b./.....b../r.r.r.../.....b.r/r......./.r...b../r.B.r.r. RED",
+     [14, 124, 1480, 13562, 149937, 1391408]),
+    ("endgame", "......../..r.R.../.......r/......../......../......b./.R...B../B...B... BLUE",
+     [5, 47, 365, 3041, 22282, 183949]),
+]
+
+def start_position(tag):
+    if tag is None:
+        return Checkers.Board(), RED
+    return board_from_tag(tag)
+
+# ================= COUNTERS =================
+def perft_search(pos, depth):
+    moves = pos.moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = pos.make(move)
+        nodes += perft_search(pos, depth - 1)
+        pos.unmake(undo)
+    return nodes
+
+def perft_play(board, color, depth):
+    other = BLUE if color == RED else RED
+    nodes = 0
+    for piece, moves in board.legal_moves(color).items():
+        if depth == 1:
+            nodes += len(moves)
+            continue
+        for move, skip in moves.items():
+            child = play(board, ((piece.row, piece.col), move, tuple((s.row, s.col) for s in skip)))
+            nodes += perft_play(child, other, depth - 1)
+    return nodes
+
+def board_masks(board, color):
+    # (own men, own kings, opponent men, opponent kings) in checkers_tablebase's orientation
+    masks = [0, 0, 0, 0]
+    for r, row in enumerate(board.board):
+        for c, p in enumerate(row):
+            if p:
+                s = checkers_tablebase.rc_square(r, c)
+                if color == BLUE:
+                    s = 31 - s
+                masks[(0 if p.color == color else 2) + p.king] |= 1 << s
+    return tuple(masks)
+
+def perft_masks(masks, depth):
+    following = checkers_tablebase.successors(*masks)
+    if depth == 1:
+        return len(following)
+    return sum(perft_masks(m, depth - 1) for m in following)
+
+COUNTERS = {
+    "search": lambda board, color, depth: perft_search(SearchPosition(board.copy(), color), depth),
+    "play": perft_play,
+    "masks": lambda board, color, depth: perft_masks(board_masks(board, color), depth),
+}
+
+# ================= RUN =================
+def run(names, depth, record=RECORD_PATH):
+    failures = 0
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    lines = []
+    for name, tag, expected in POSITIONS:
+        if names and name not in names:
+            continue
+        board, color = start_position(tag)
+        for d in range(1, depth + 1):
+            counts = {}
+            for counter, perft in COUNTERS.items():
+                start = time.perf_counter()
+                counts[counter] = nodes = perft(board, color, d)
+                elapsed = time.perf_counter() - start
+                lines.append(f"{stamp}\t{name}\t{d}\t{counter}\t{nodes}\t{elapsed:.4f}\t{nodes / max(elapsed, 1e-9):.0f}")
+                print(f"{name:8s} d{d} {counter:6s} {nodes:10d} {elapsed:8.3f}s {nodes / max(elapsed, 1e-9):12.0f} n/s")
+            wanted = expected[d - 1] if d <= len(expected) else None
+            if len(set(counts.values())) > 1 or (wanted is not None and counts["search"] != wanted):
+                failures += 1
+                print(f"MISMATCH {name} depth {d}: {counts}, stored {wanted}")
+    if record:
+        new = not os.path.exists(record)
+        with open(record, "a") as f:
+            if new:
+                f.write("time\tposition\tdepth\tcounter\tnodes\tseconds\tnodes_per_second\n")
+            f.write("\n".join(lines) + "\n")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count Checkers move trees and time the move path.")
+    parser.add_argument("--depth", type=int, default=5, help="deepest perft depth (default 5)")
+    parser.add_argument("--position", action="append", choices=[name for name, _, _ in POSITIONS],
+                        help="only this stored position (repeatable)")
+    parser.add_argument("--record", default=RECORD_PATH, help="tsv file the results are appended to")
+    parser.add_argument("--no-record", action="store_true", help="don't append to the record file")
+    args = parser.parse_args()
+    failures = run(args.position, args.depth, None if args.no_record else args.record)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,314 @@
+"""Endgame tablebase for Checkers.py.
+
+Build it once offline:
+
+    python checkers_tablebase.py --pieces 3 --out checkers_tb.bin
+
+Positions are stored from the point of view of the side to move, always
+oriented so that the mover's men walk "up" the board like RED in
+Checkers.py (a BLUE-to-move position is rotated 180 degrees first).
+That halves the table and means no side-to-move bit is needed.
+
+File layout (little endian):
+    header  "CKTB", u16 version, u16 max pieces, u32 count
+    keys    count x u64, sorted
+    values  count x i16
+
+Only decisive positions are written; any position within the piece limit
+that is missing from the file is a draw. A value v > 0 means the mover wins
+in v plies, v < 0 means the mover loses in -v - 1 plies (so -1 is a side
+with no legal move).
+"""
+import argparse
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import sys
+import time
+
+MAGIC = b"CKTB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+MAX_PIECES = 7   # 8 bits per piece in a 64-bit key
+
+# piece codes, from the mover's point of view
+OWN_MAN, OWN_KING, OPP_MAN, OPP_KING = 0, 1, 2, 3
+
+# ================= GEOMETRY =================
+# the 32 dark squares, numbered row by row: square s sits on row s // 4
+def square_rc(s):
+    r = s // 4
+    return r, 2 * (s % 4) + (1 if r % 2 == 0 else 0)
+
+def rc_square(r, c):
+    return r * 4 + c // 2
+
+DIRS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]   # the first two are "forward" for a man
+STEP = []
+JUMP = []
+for s in range(32):
+    r, c = square_rc(s)
+    steps, jumps = [], []
+    for dr, dc in DIRS:
+        steps.append(rc_square(r+dr, c+dc) if 0 <= r+dr < 8 and 0 <= c+dc < 8 else -1)
+        jumps.append(rc_square(r+2*dr, c+2*dc) if 0 <= r+2*dr < 8 and 0 <= c+2*dc < 8 else -1)
+    STEP.append(steps)
+    JUMP.append(jumps)
+
+def flip(mask):
+    # rotate the board 180 degrees: square s -> 31 - s
+    out = 0
+    while mask:
+        low = mask & -mask
+        out |= 1 << (32 - low.bit_length())
+        mask ^= low
+    return out
+
+def squares(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+# ================= KEYS =================
+def encode(pieces, flipped=False):
+    """Key for a position given as (row, col, own, king) tuples for the mover.
+
+    Pass flipped=True when the mover's men walk down the board (BLUE in
+    Checkers.py) so the position is rotated into the stored orientation.
+    """
+    codes = []
+    for r, c, own, king in pieces:
+        s = rc_square(r, c)
+        if flipped:
+            s = 31 - s
+        code = (OWN_KING if king else OWN_MAN) if own else (OPP_KING if king else OPP_MAN)
+        codes.append((s << 2 | code) + 1)
+    codes.sort()
+    key = 0
+    for i, code in enumerate(codes):
+        key |= code << (8 * i)
+    return key
+
+def mask_key(own_men, own_kings, opp_men, opp_kings):
+    codes = []
+    for mask, code in ((own_men, OWN_MAN), (own_kings, OWN_KING),
+                       (opp_men, OPP_MAN), (opp_kings, OPP_KING)):
+        for s in squares(mask):
+            codes.append((s << 2 | code) + 1)
+    codes.sort()
+    key = 0
+    for i, code in enumerate(codes):
+        key |= code << (8 * i)
+    return key
+
+# ================= MOVES =================
+def successors(own_men, own_kings, opp_men, opp_kings):
+    """Positions after every legal move, already flipped to the new mover.
+
+    Mirrors get_moves() in Checkers.py: single steps and single jumps, men
+    only forward, no forced captures, promotion on the far row.
+    """
+    occupied = own_men | own_kings | opp_men | opp_kings
+    opp = opp_men | opp_kings
+    result = []
+    for is_king, mask in ((False, own_men), (True, own_kings)):
+        for s in squares(mask):
+            bit = 1 << s
+            for d in (range(4) if is_king else range(2)):
+                t = STEP[s][d]
+                if t < 0:
+                    continue
+                tbit = 1 << t
+                captured = 0
+                if occupied & tbit:
+                    if not opp & tbit:
+                        continue
+                    t = JUMP[s][d]
+                    if t < 0 or occupied & (1 << t):
+                        continue
+                    captured = tbit
+                    tbit = 1 << t
+                men, kings = own_men, own_kings
+                if is_king:
+                    kings = kings ^ bit | tbit
+                elif t < 4:   # reached row 0
+                    men, kings = men ^ bit, kings | tbit
+                else:
+                    men = men ^ bit | tbit
+                result.append((flip(opp_men & ~captured), flip(opp_kings & ~captured),
+                               flip(men), flip(kings)))
+    return result
+
+# ================= GENERATOR =================
+def placements(own_men, own_kings, opp_men, opp_kings):
+    # every legal placement of a material signature as (own_men, own_kings, opp_men, opp_kings)
+    def fill(counts, allowed, used):
+        if not counts:
+            yield ()
+            return
+        n, ok = counts[0], allowed[0]
+        for combo in itertools.combinations([s for s in range(32) if s in ok and not used >> s & 1], n):
+            mask = sum(1 << s for s in combo)
+            for rest in fill(counts[1:], allowed[1:], used | mask):
+                yield (mask,) + rest
+
+    everywhere = set(range(32))
+    yield from fill((own_men, own_kings, opp_men, opp_kings),
+                    (set(range(4, 32)), everywhere, set(range(28)), everywhere), 0)
+
+def materials(max_pieces):
+    """Slices in solving order.
+
+    A non-promoting, non-capturing move turns material (a, b, c, d) into
+    (c, d, a, b), so those two belong to the same slice. Captures shrink the
+    total and promotions shrink the number of men, so solving by total and
+    then by men count means every move leaving a slice lands in a solved one.
+    """
+    seen = set()
+    order = []
+    for total in range(2, max_pieces + 1):
+        for men in range(total + 1):
+            for a, b, c, d in itertools.product(range(total + 1), repeat=4):
+                if a + b + c + d != total or a + c != men or not a + b or not c + d:
+                    continue
+                if (a, b, c, d) in seen:
+                    continue
+                seen.add((a, b, c, d))
+                seen.add((c, d, a, b))
+                order.append({(a, b, c, d), (c, d, a, b)})
+    return order
+
+def solve_slice(slice_materials, solved):
+    positions = []
+    index = {}
+    for material in slice_materials:
+        for pos in placements(*material):
+            index[mask_key(*pos)] = len(positions)
+            positions.append(pos)
+
+    n = len(positions)
+    preds = [[] for _ in range(n)]
+    pending = [0] * n        # in-slice successors not yet known to be won by the opponent
+    longest = [0] * n        # longest opponent win seen so far
+    escape = [False] * n     # has a successor that is not an opponent win
+    heap = []
+
+    for i, pos in enumerate(positions):
+        succ = successors(*pos)
+        if not succ:
+            heapq.heappush(heap, (0, i, False))
+            continue
+        for nxt in succ:
+            if not (nxt[0] | nxt[1]):    # captured the last enemy piece
+                heapq.heappush(heap, (1, i, True))
+                escape[i] = True
+                continue
+            key = mask_key(*nxt)
+            j = index.get(key)
+            if j is not None:
+                preds[j].append(i)
+                pending[i] += 1
+                continue
+            v = solved.get(key, 0)
+            if v < 0:
+                heapq.heappush(heap, (-v, i, True))
+                escape[i] = True
+            elif v > 0:
+                longest[i] = max(longest[i], v)
+            else:
+                escape[i] = True
+        if not pending[i] and not escape[i]:
+            heapq.heappush(heap, (longest[i] + 1, i, False))
+
+    result = {}
+    while heap:
+        plies, i, win = heapq.heappop(heap)
+        key = mask_key(*positions[i])
+        if key in result:
+            continue
+        result[key] = plies if win else -plies - 1
+        for j in preds[i]:
+            if mask_key(*positions[j]) in result:
+                continue
+            if not win:
+                heapq.heappush(heap, (plies + 1, j, True))
+                escape[j] = True
+            else:
+                pending[j] -= 1
+                longest[j] = max(longest[j], plies)
+                if not pending[j] and not escape[j]:
+                    heapq.heappush(heap, (longest[j] + 1, j, False))
+    return result, n
+
+def generate(max_pieces, out, verbose=True):
+    if not 2 <= max_pieces <= MAX_PIECES:
+        raise ValueError(f"max_pieces must be between 2 and {MAX_PIECES}")
+    solved = {}
+    total = 0
+    start = time.time()
+    for slice_materials in materials(max_pieces):
+        result, n = solve_slice(slice_materials, solved)
+        solved.update(result)
+        total += n
+        if verbose:
+            print(f"{sorted(slice_materials)}: {n} positions, {len(result)} decisive "
+                  f"({time.time() - start:.1f}s)")
+
+    keys = sorted(solved)
+    with open(out, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, max_pieces, len(keys)))
+        f.write(struct.pack(f"<{len(keys)}Q", *keys))
+        f.write(struct.pack(f"<{len(keys)}h", *(solved[k] for k in keys)))
+    if verbose:
+        print(f"wrote {out}: {total} positions, {len(keys)} decisive, "
+              f"{os.path.getsize(out)} bytes")
+
+# ================= PROBING =================
+class Tablebase:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_pieces, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} checkers tablebase")
+        self.keys_at = HEADER.size
+        self.values_at = self.keys_at + 8 * self.count
+
+    def probe(self, key):
+        # stored value for key, 0 (draw) when it is not in the file
+        lo, hi = 0, self.count
+        data, keys_at = self.data, self.keys_at
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = struct.unpack_from("<Q", data, keys_at + 8 * mid)[0]
+            if k < key:
+                lo = mid + 1
+            elif k > key:
+                hi = mid
+            else:
+                return struct.unpack_from("<h", data, self.values_at + 2 * mid)[0]
+        return 0
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+def load(path):
+    # the tablebase is optional: engines just search normally without it
+    if not os.path.exists(path):
+        return None
+    return Tablebase(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Checkers endgame tablebase.")
+    parser.add_argument("--pieces", type=int, default=3, help="largest total piece count (default 3)")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "checkers_tb.bin"))
+    args = parser.parse_args()
+    try:
+        generate(args.pieces, args.out)
+    except ValueError as e:
+        sys.exit(str(e))
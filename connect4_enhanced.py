@@ -1,7 +1,12 @@
 import pygame
 import sys
-import math
-import random
+import threading
+
+import game_record
+from connect4_search import CONNECT, WIN, Connect4Position, analysis_cache, grid_result, grid_tag
+from game_search import Searcher, SearchCancelled
+from move_profiler import profiled
+from render_scheduler import RenderScheduler
 
 pygame.init()
 
@@ -10,6 +15,10 @@ WIDTH, HEIGHT = 700, 700
 ROWS, COLS = 6, 7
 CELL = WIDTH // COLS
 RADIUS = CELL // 2 - 6
+LEFT = 0   # x of the board, so narrower boards sit in the middle of the window
+
+# (rows, cols, in a row) offered by the menu; the first is classic Connect 4
+VARIANTS = [(6, 7, 4), (8, 9, 4), (9, 9, 5)]
 
 BG = (18, 20, 35)
 BOARD = (50, 70, 140)
@@ -17,36 +26,28 @@ EMPTY = (25, 25, 25)
 X_COLOR = (255, 90, 90)
 O_COLOR = (90, 200, 255)
 TEXT = (240, 240, 240)
+DIM = (150, 150, 170)
+
+ANALYSIS_DEPTH = 12   # deepest the column scores are refined to
+SCORE_H = 30          # strip at the bottom of the message row holding the column scores
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Connect 4 – AI Edition")
-clock = pygame.time.Clock()
+screen = None   # created in main(), so the launcher can import this module and reuse its window
 font = pygame.font.SysFont("arial", 32, bold=True)
 small = pygame.font.SysFont("arial", 22)
+ANALYSIS_DONE = pygame.event.custom_type()   # posted by ColumnAnalysis when a column's score changed
 
 # ================= LOGIC ENGINE =================
 class Connect4:
-    ROWS = 6
-    COLS = 7
+    def __init__(self, rows=6, cols=7, k=CONNECT):
+        self.ROWS, self.COLS, self.K = rows, cols, k
+        self.searcher = Searcher(store=analysis_cache())   # table kept between moves and, on disk, between sessions
 
     def initial_state(self):
-     return [[" ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " "]]
+        return [[" "] * self.COLS for _ in range(self.ROWS)]
 
     def current_player(self, state):
-        count_X = 0
-        count_O = 0
-        for row in range(6):
-            for col in range(7):
-                symbol = state[row][col]
-                if symbol == 'X':
-                    count_X += 1
-                elif symbol == 'O':
-                    count_O += 1
+        count_X = sum(row.count('X') for row in state)
+        count_O = sum(row.count('O') for row in state)
 
         # If they are the same, it's player X's turn
         if count_X == count_O:
@@ -68,67 +69,8 @@ class Connect4:
         return new
 
     def terminal(self, state):
-        terminal = False
-        full = False
-        player = None
-        for row in range(6):
-            for col in range(4):
-                if state[row][col] == state[row][col+1] == state[row][col+2] == state[row][col+3] and state[row][col] != " ":
-                    terminal = True
-                    player = state[row][col]
-                    break
-            if terminal:
-                break
-
-        if  terminal==False:
-            for col in range(7):
-                for row in range(3):  
-                    if state[row][col] == state[row+1][col] == state[row+2][col] == state[row+3][col] and state[row][col] != " ":
-                        terminal = True
-                        player = state[row][col]
-                        break
-                if terminal:
-                    break
-
-        if terminal==False:
-            for row in range(3): #    \
-                for col in range(4):
-                    if state[row][col] == state[row+1][col+1] == state[row+2][col+2] == state[row+3][col+3] and state[row][col] != " ":
-                        terminal = True
-                        player = state[row][col]
-                        break
-                if terminal:
-                    break
-
-        if terminal==False:
-            for row in range(3):#0->2 /    row+1
-                for col in range(3, 7):# 3->6      col-1        
-                    if state[row][col] == state[row+1][col-1] == state[row+2][col-2] == state[row+3][col-3] and state[row][col] != " ":
-                        terminal = True
-                        player = state[row][col]
-                        break
-                if terminal:
-                    break
-
-        if terminal==False:
-            empty_count = 0
-            for row in range(6):
-                for col in range(7):
-                    if state[row][col] == " ":
-                        empty_count += 1
-            if empty_count == 0:
-                full = True
-
-        if terminal:
-            if player == "X":
-                return 1
-            elif player == "O":
-                return -1
-        elif full:
-            return 0
-        else:
-            return None
-
+        # 1 / -1 for an X / O line of K, 0 for a full board, None otherwise
+        return grid_result(state, self.K)
 
     def heuristic(self, state):
         score = 0
@@ -137,130 +79,260 @@ class Connect4:
         score -= center.count('O') * 3
         return score
 
-    def minimax(self, state, depth, alpha, beta, maximizing):
-        term = self.terminal(state)
-        if term is not None or depth == 0:
-            return term if term is not None else self.heuristic(state)
-
-        if maximizing:
-            value = -math.inf
-            for a in self.available_actions(state):
-                value = max(value, self.minimax(
-                    self.take_action(state, a), depth-1, alpha, beta, False))
-                alpha = max(alpha, value)
-                if alpha >= beta: break
-            return value
-        else:
-            value = math.inf
-            for a in self.available_actions(state):
-                value = min(value, self.minimax(
-                    self.take_action(state, a), depth-1, alpha, beta, True))
-                beta = min(beta, value)
-                if alpha >= beta: break
-            return value
-
+    @profiled(lambda self, state, depth: (grid_tag(state), depth))
     def best_action(self, state, depth):
         player = self.current_player(state)
-        actions = self.available_actions(state)
-        best = -math.inf if player == 'X' else math.inf
-        choice = random.choice(actions)
-
-        for a in actions:
-            val = self.minimax(self.take_action(state, a),
-                               depth-1, -math.inf, math.inf,
-                               player == 'O')
-            if player == 'X' and val > best:
-                best, choice = val, a
-            if player == 'O' and val < best:
-                best, choice = val, a
-        return choice
+        _, col = self.searcher.search(Connect4Position(state, self.heuristic, self.K), depth)
+        return (player, col)
+
+# ================= ANALYSIS =================
+class ColumnAnalysis:
+    # scores every column of state in a background thread, one ply deeper per pass, so the
+    # window stays live; it shares the game's Searcher and its table with the AI, so cancel()
+    # it before the AI searches
+    def __init__(self, game, state, max_depth=ANALYSIS_DEPTH):
+        self.player = game.current_player(state)
+        self.scores = {}   # column -> (score for the side to move, depth)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(game, state, max_depth), daemon=True)
+        self.thread.start()
+
+    def run(self, game, state, max_depth):
+        pos = Connect4Position(state, game.heuristic, game.K)
+        if pos.terminal() is not None:
+            return
+        sign = pos.turn()
+        try:
+            for depth in range(1, max_depth + 1):
+                for col in pos.columns():
+                    pos.make(col)
+                    value = sign * round(game.searcher.value(pos, depth - 1, stop=self.stop))
+                    pos.unmake(col)
+                    changed = self.scores.get(col, (None,))[0] != value
+                    self.scores[col] = (value, depth)
+                    if changed and pygame.display.get_init():
+                        pygame.event.post(pygame.event.Event(ANALYSIS_DONE))
+        except SearchCancelled:
+            pass
+
+    def cancel(self):
+        self.stop.set()
+        self.thread.join()
 
 # ================= GUI =================
-def draw(state, msg=""):
-    screen.fill(BG)
-    pygame.draw.rect(screen, BOARD, (0, CELL, WIDTH, HEIGHT))
-
+MSG_RECT = pygame.Rect(0, 0, WIDTH, CELL - SCORE_H)
+scheduler = None   # RenderScheduler for the window, created with it in main()
+overlay = {}       # column -> (text, color) drawn above it, see update_overlay()
+
+def layout(rows, cols):
+    # size the cells so the board plus the message row fits the window
+    global ROWS, COLS, CELL, RADIUS, LEFT, MSG_RECT
+    ROWS, COLS = rows, cols
+    CELL = min(WIDTH // cols, HEIGHT // (rows + 1))
+    RADIUS = CELL // 2 - 6
+    LEFT = (WIDTH - cols * CELL) // 2
+    MSG_RECT = pygame.Rect(0, 0, WIDTH, CELL - SCORE_H)
+
+def column_at(x):
+    # board column under x, or None outside the board
+    c = (x - LEFT) // CELL
+    return c if x >= LEFT and c < COLS else None
+
+def column_rect(c):
+    return pygame.Rect(LEFT + c * CELL, CELL, CELL, HEIGHT - CELL)
+
+def score_rect(c):
+    return pygame.Rect(LEFT + c * CELL, CELL - SCORE_H, CELL, SCORE_H)
+
+def score_label(value):
+    # heuristic points, or win / loss once the search sees the game end
+    if abs(value) > WIN // 2:
+        return "win" if value > 0 else "loss"
+    return f"{value:+d}"
+
+def update_overlay(analysis):
+    # labels for the latest scores of analysis (None clears them); only changed ones are redrawn
+    global overlay
+    scores = analysis.scores.copy() if analysis else {}
+    best = max((value for value, _ in scores.values()), default=None)
+    mover = X_COLOR if analysis and analysis.player == 'X' else O_COLOR
+    labels = {c: (score_label(value), mover if value == best else DIM) for c, (value, _) in scores.items()}
+    for c in set(labels) | set(overlay):
+        if labels.get(c) != overlay.get(c):
+            scheduler.invalidate(score_rect(c))
+    overlay = labels
+
+def paint_board(surface):
+    # the static layer: background, board and empty holes
+    surface.fill(BG)
+    pygame.draw.rect(surface, BOARD, (LEFT, CELL, COLS * CELL, HEIGHT))
     for r in range(ROWS):
         for c in range(COLS):
-            x = c * CELL + CELL // 2
-            y = (r + 1) * CELL + CELL // 2
-            color = EMPTY
-            if state[r][c] == 'X': color = X_COLOR
-            if state[r][c] == 'O': color = O_COLOR
-            pygame.draw.circle(screen, color, (x, y), RADIUS)
+            pygame.draw.circle(surface, EMPTY, (LEFT + c * CELL + CELL // 2, (r + 1) * CELL + CELL // 2), RADIUS)
 
-    label = small.render(msg, True, TEXT)
-    screen.blit(label, (10, 10))
-    pygame.display.update()
+def draw(state, msg=""):
+    # repaint only what was invalidated since the last frame
+    rects = scheduler.dirty_rects()
+    if rects is None:
+        scheduler.restore()
+        rects = [screen.get_rect()]
+    else:
+        for rect in rects:
+            scheduler.restore(rect)
+
+    for c in range(COLS):
+        if column_rect(c).collidelist(rects) == -1:
+            continue
+        for r in range(ROWS):
+            if state[r][c] == " ":
+                continue
+            color = X_COLOR if state[r][c] == 'X' else O_COLOR
+            pygame.draw.circle(screen, color, (LEFT + c * CELL + CELL // 2, (r + 1) * CELL + CELL // 2), RADIUS)
+
+    if MSG_RECT.collidelist(rects) != -1:
+        label = small.render(msg, True, TEXT)
+        screen.blit(label, (10, 10))
+    for c, (text, color) in overlay.items():
+        rect = score_rect(c)
+        if rect.collidelist(rects) != -1:
+            label = small.render(text, True, color)
+            screen.blit(label, label.get_rect(center=rect.center))
+    scheduler.present()
+
+def show(state, msg):
+    # put a new message up right away
+    scheduler.invalidate(MSG_RECT)
+    draw(state, msg)
 
 # ================= MENU =================
 def menu():
+    # (mode, depth, board, column scores on), None when the window is closed
     mode = None
     depth = 4
+    variant = 0
+    analysis = True
 
     while True:
-        screen.fill(BG)
-        title = font.render("CONNECT 4", True, TEXT)
-        screen.blit(title, (WIDTH//2 - title.get_width()//2, 100))
-
-        options = [
-            "1 - Human vs Human",
-            "2 - Human vs AI",
-            "3 - AI vs AI",
-            f"AI Depth: {depth}  (UP / DOWN)",
-            "Press Number to Start"
-        ]
-
-        for i, txt in enumerate(options):
-            t = small.render(txt, True, TEXT)
-            screen.blit(t, (WIDTH//2 - t.get_width()//2, 220 + i*40))
-
-        pygame.display.update()
-
-        for e in pygame.event.get():
+        if scheduler.dirty:
+            screen.fill(BG)
+            title = font.render("CONNECT 4", True, TEXT)
+            screen.blit(title, (WIDTH//2 - title.get_width()//2, 100))
+
+            options = [
+                "1 - Human vs Human",
+                "2 - Human vs AI",
+                "3 - AI vs AI",
+                f"AI Depth: {depth}  (UP / DOWN)",
+                "Board: {}x{}, {} in a row  (V)".format(*VARIANTS[variant]),
+                f"Column scores: {'on' if analysis else 'off'}  (A)",
+                "Press Number to Start"
+            ]
+
+            for i, txt in enumerate(options):
+                t = small.render(txt, True, TEXT)
+                screen.blit(t, (WIDTH//2 - t.get_width()//2, 220 + i*40))
+
+            scheduler.present()
+
+        for e in scheduler.wait():
             if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
+                return None
             if e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_1: mode = 1
                 if e.key == pygame.K_2: mode = 2
                 if e.key == pygame.K_3: mode = 3
                 if e.key == pygame.K_UP and depth < 6: depth += 1
                 if e.key == pygame.K_DOWN and depth > 1: depth -= 1
+                if e.key == pygame.K_v: variant = (variant + 1) % len(VARIANTS)
+                if e.key == pygame.K_a: analysis = not analysis
                 if mode:
-                    return mode, depth
+                    return mode, depth, VARIANTS[variant], analysis
+                scheduler.invalidate()
 
 # ================= MAIN =================
 def main():
-    mode, depth = menu()
-    game = Connect4()
+    # while ColumnAnalysis searches, get the GIL back in time for the next frame; the old
+    # interval comes back on the way out, for the launcher and whatever it runs next
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(0.001)
+    try:
+        play()
+    finally:
+        sys.setswitchinterval(switch)
+
+def play():
+    # menu, then one game
+    global screen, scheduler
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Connect 4 – AI Edition")
+    scheduler = RenderScheduler(screen, 60)
+    picked = menu()
+    if picked is None:   # window closed
+        return
+    mode, depth, (rows, cols, k), scores_on = picked
+    layout(rows, cols)
+    game = Connect4(rows, cols, k)
     state = game.initial_state()
+    scheduler.set_background(paint_board)
+    msg = ""
+    moves = []   # columns played, for game_record
+    analysis = None   # ColumnAnalysis of state while the column scores are on
+
+    def stop_analysis():
+        nonlocal analysis
+        if analysis:
+            analysis.cancel()
+            analysis = None
+        update_overlay(None)
 
     while True:
-        clock.tick(60)
-        draw(state)
-
         player = game.current_player(state)
         ai_turn = (mode == 3) or (mode == 2 and player == 'O')
 
-        for e in pygame.event.get():
+        # scores are for the human about to move; the AI would only cancel them
+        if scores_on and not ai_turn and analysis is None and game.terminal(state) is None:
+            analysis = ColumnAnalysis(game, state)
+        if scheduler.dirty:
+            draw(state, msg)
+
+        # a human turn sleeps until there is input; an AI turn must not block
+        for e in scheduler.wait(0 if ai_turn else None):
             if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
+                stop_analysis()
+                return
+
+            if e.type == ANALYSIS_DONE:
+                update_overlay(analysis)
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_a:
+                scores_on = not scores_on
+                stop_analysis()
 
             if not ai_turn and e.type == pygame.MOUSEBUTTONDOWN:
-                col = e.pos[0] // CELL
+                col = column_at(e.pos[0])
                 if col in [c for _, c in game.available_actions(state)]:
+                    stop_analysis()
                     state = game.take_action(state, (player, col))
+                    moves.append(col)
+                    scheduler.invalidate(column_rect(col))
 
         if ai_turn:
-            draw(state, "AI thinking...")
+            show(state, "AI thinking...")
             pygame.time.wait(300)
-            state = game.take_action(state, game.best_action(state, depth))
+            stop_analysis()   # the AI needs the searcher to itself
+            action = game.best_action(state, depth)
+            state = game.take_action(state, action)
+            moves.append(action[1])
+            scheduler.invalidate(column_rect(action[1]))
+            scheduler.invalidate(MSG_RECT)
 
         result = game.terminal(state)
         if result is not None:
             msg = "Draw" if result == 0 else ("X Wins" if result == 1 else "O Wins")
-            draw(state, msg)
+            stop_analysis()
+            show(state, msg)
+            game_record.write("connect4", f"{rows}x{cols}k{k}", game_record.CONNECT4_RESULTS[result], moves, mode=mode, depth=depth)
             pygame.time.wait(3000)
             return
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
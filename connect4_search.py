@@ -0,0 +1,268 @@
+"""Connect 4 (and K-in-a-row on any board) positions for game_search.
+
+game.py, Connect4.py and connect4_enhanced.py keep their own grids
+(lists of rows holding 'X', 'O' or ' ') and their own heuristic(); this
+wraps a copy of such a grid in the protocol game_search.Searcher expects.
+X moves first and maximizes. A finished game scores WIN for an X win
+and -WIN for an O win, less the number of pieces on the board, so the
+search prefers the quickest win and the slowest loss over any heuristic
+score; a full board scores 0. grid_result() and Connect4Position.result
+keep the games' own 1 / -1 / 0.
+
+Pieces are kept as one bitboard per player, cell (r, c) being bit
+r * (cols + 1) + c; the spare bit closing every row stays empty, so a
+line shifted sideways can't wrap into the next row. Every K-cell window
+of a board size is built once as a bitmask (LineTables). Checking a drop
+only looks at the windows through that cell, so bigger boards such as
+9x9 with K=5 cost no full rescans.
+
+A threat is an empty cell that would complete a window; all of a side's
+threats come from a few shifts and ANDs of its bitboard. moves() plays an immediate win or the block of one
+without branching and leaves out columns that put the opponent's winning
+cell within reach, and evaluate() adds odd/even threat parity to the
+front-end's heuristic (X wants threats on odd rows counted from the
+bottom, O on even ones, since zugzwang hands each side those squares).
+
+With weights trained by learned_eval.py (connect4_eval.npz), positions on
+the classic 6x7 board are scored by that model instead, a batch of
+sibling leaves at a time.
+
+A position and its mirror image share one key, so the analysis cache
+(connect4_analysis.db next to this file) holds each pair once.
+"""
+import os
+import random
+
+import learned_eval
+from analysis_cache import open_cache
+
+CONNECT = 4
+WIN = 10000   # a win's score before the pieces it took; far above any heuristic score
+LINES = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+def grid_tag(grid):
+    # one-line picture of a grid, rows top to bottom, for logs and profiles
+    return "/".join("".join(row).replace(" ", ".") for row in grid)
+
+def centre_heuristic(grid):
+    # the heuristic the Connect 4 front-ends use: 3 points per piece in the centre column
+    center = [row[len(row) // 2] for row in grid]
+    return 3 * center.count("X") - 3 * center.count("O")
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "connect4_analysis.db")
+CACHE_TAG = "centre heuristic + threat parity, line-table keys, wins by length"   # change it along with the heuristic or the keys
+
+MODEL_BOARD = (6, 7, CONNECT)   # the board the learned evaluation is trained on
+EVAL_MODEL = learned_eval.load(learned_eval.CONNECT4_PATH, "connect4 6x7k4")   # None until trained
+
+def analysis_cache():
+    # shared by the Connect 4 front-ends; None when the file can't be opened
+    tag = CACHE_TAG if EVAL_MODEL is None else f"{CACHE_TAG}, model {EVAL_MODEL.tag}"
+    return open_cache(CACHE_PATH, tag)
+
+# ================= LINE TABLES =================
+class LineTables:
+    # everything about a rows x cols board with k in a row that never changes, built once
+    def __init__(self, rows, cols, k):
+        self.rows, self.cols, self.k = rows, cols, k
+        self.stride = stride = cols + 1
+        self.nbits = cells = rows * stride
+        self.full = sum(1 << (r * stride + c) for r in range(rows) for c in range(cols))
+        self.windows = []                          # bitmask of every k-cell line
+        self.through = [[] for _ in range(cells)]  # windows containing each cell
+        for r in range(rows):
+            for c in range(cols):
+                for dr, dc in LINES:
+                    er, ec = r + (k - 1) * dr, c + (k - 1) * dc
+                    if not (0 <= er < rows and 0 <= ec < cols):
+                        continue
+                    mask = 0
+                    for i in range(k):
+                        mask |= 1 << ((r + i * dr) * stride + c + i * dc)
+                    self.windows.append(mask)
+                    for i in range(k):
+                        self.through[(r + i * dr) * stride + c + i * dc].append(mask)
+        self.steps = [dr * stride + dc for dr, dc in LINES]   # bit distance between neighbours of a line
+        self.mirror = [r * stride + cols - 1 - c if c < cols else 0 for r in range(rows) for c in range(stride)]
+        # cells on odd rows counted from the bottom (1 = bottom row)
+        self.odd = sum(1 << (r * stride + c) for r in range(rows) for c in range(cols) if (rows - r) % 2)
+        # centre columns first: they take part in the most lines, so alpha-beta cuts sooner
+        self.order = sorted(range(cols), key=lambda c: abs(2 * c - (cols - 1)))
+        rng = random.Random(f"{rows}x{cols}k{k}")
+        self.zobrist = {p: [rng.getrandbits(64) for _ in range(cells)] for p in "XO"}
+
+    def threats(self, own, empty):
+        # empty cells that would complete a line of k for the owner of own
+        k = self.k
+        found = 0
+        for step in self.steps:
+            # before[m] / after[m]: empty cells with m own pieces in a row just before / after them on the line
+            before, after = [empty], [empty]
+            for m in range(1, k):
+                before.append(before[-1] & own << m * step)
+                after.append(after[-1] & own >> m * step)
+            for m in range(k):
+                found |= before[m] & after[k - 1 - m]
+        return found
+
+    def bits(self, grid, player):
+        return sum(1 << (r * self.stride + c) for r, row in enumerate(grid)
+                   for c, cell in enumerate(row) if cell == player)
+
+    def result(self, grid):
+        # 1 / -1 when X / O has k in a row, 0 for a full board, None while the game goes on
+        for player, score in (("X", 1), ("O", -1)):
+            bits = self.bits(grid, player)
+            if any(bits & w == w for w in self.windows):
+                return score
+        if all(cell != " " for cell in grid[0]):
+            return 0
+        return None
+
+_tables = {}
+
+def line_tables(rows, cols, k=CONNECT):
+    tables = _tables.get((rows, cols, k))
+    if tables is None:
+        tables = _tables[rows, cols, k] = LineTables(rows, cols, k)
+    return tables
+
+def grid_result(grid, k=CONNECT):
+    # the terminal check for a grid of any size: 1, -1, 0 or None like Connect4Position.result
+    return line_tables(len(grid), len(grid[0]), k).result(grid)
+
+# ================= POSITION =================
+class Connect4Position:
+    def __init__(self, grid, heuristic, k=CONNECT):
+        self.grid = [row[:] for row in grid]
+        self.rows, self.cols = len(grid), len(grid[0])
+        self.heuristic = heuristic   # heuristic(grid) -> score for X
+        self.tables = tables = line_tables(self.rows, self.cols, k)
+        self.stride = tables.stride
+        # lowest empty row of every column, -1 when it is full
+        self.top = [max((r for r in range(self.rows) if grid[r][c] == " "), default=-1)
+                    for c in range(self.cols)]
+        self.bits = {p: tables.bits(grid, p) for p in "XO"}
+        self.empty = sum(row.count(" ") for row in grid)
+        self.player = "X" if bin(self.bits["X"]).count("1") == bin(self.bits["O"]).count("1") else "O"
+        self.hash = self.mirror = 0   # zobrist keys of the grid and of its mirror image
+        for p in "XO":
+            for cell in range(self.rows * self.stride):
+                if self.bits[p] >> cell & 1:
+                    self.hash ^= tables.zobrist[p][cell]
+                    self.mirror ^= tables.zobrist[p][tables.mirror[cell]]
+        self.result = tables.result(self.grid)
+        self.model = EVAL_MODEL if (self.rows, self.cols, k) == MODEL_BOARD else None
+        self.batch = self.model is not None   # game_search then scores leaves through evaluate_moves()
+
+    # ---------------- threats ----------------
+    def columns(self):
+        # every legal column, centre first
+        return [c for c in self.tables.order if self.top[c] >= 0]
+
+    def threats(self, player):
+        # bitboard of the empty cells where player would complete a line
+        tables = self.tables
+        return tables.threats(self.bits[player], tables.full & ~(self.bits["X"] | self.bits["O"]))
+
+    def threat_parity(self):
+        # score for X: one point per threat, two for a threat on the row parity that favours its owner
+        odd = self.tables.odd
+        x_threats, o_threats = self.threats("X"), self.threats("O")
+        return (bin(x_threats).count("1") + bin(x_threats & odd).count("1")
+                - bin(o_threats).count("1") - bin(o_threats & ~odd).count("1"))
+
+    # ---------------- game_search protocol ----------------
+    def moves(self):
+        # forced moves come alone; columns that hand the opponent a win are only played when nothing else is left
+        stride = self.stride
+        playable = [(c, self.top[c] * stride + c) for c in self.columns()]
+        mine = self.threats(self.player)
+        for c, cell in playable:
+            if mine >> cell & 1:
+                return [c]
+        theirs = self.threats("O" if self.player == "X" else "X")
+        for c, cell in playable:
+            if theirs >> cell & 1:
+                return [c]   # with two such cells the game is lost whichever one is blocked
+        safe = [c for c, cell in playable if cell < stride or not theirs >> (cell - stride) & 1]
+        return safe or [c for c, _ in playable]
+
+    def make(self, col):
+        r = self.top[col]
+        cell = r * self.stride + col
+        p = self.player
+        tables = self.tables
+        self.grid[r][col] = p
+        self.top[col] = r - 1
+        self.empty -= 1
+        bits = self.bits[p] | 1 << cell
+        self.bits[p] = bits
+        self.hash ^= tables.zobrist[p][cell]
+        self.mirror ^= tables.zobrist[p][tables.mirror[cell]]
+        # only the windows through the new piece can have been completed
+        if any(bits & w == w for w in tables.through[cell]):
+            self.result = 1 if p == "X" else -1
+        elif not self.empty:
+            self.result = 0
+        self.player = "O" if p == "X" else "X"
+        return col
+
+    def unmake(self, col):
+        # moves are never made from a finished position, so the result goes back to None
+        r = self.top[col] + 1
+        cell = r * self.stride + col
+        p = self.player = "O" if self.player == "X" else "X"
+        tables = self.tables
+        self.grid[r][col] = " "
+        self.top[col] = r
+        self.empty += 1
+        self.bits[p] ^= 1 << cell
+        self.hash ^= tables.zobrist[p][cell]
+        self.mirror ^= tables.zobrist[p][tables.mirror[cell]]
+        self.result = None
+
+    def key(self):
+        # the side to move follows from the piece counts, so the cells alone are enough;
+        # the smaller of the two keys makes a position and its mirror image the same entry
+        return min(self.hash, self.mirror)
+
+    def orient(self, col):
+        # columns in the table are stored in the frame of key()
+        return self.cols - 1 - col if self.mirror < self.hash else col
+
+    def terminal(self):
+        if self.result:
+            return self.result * (WIN - (self.rows * self.cols - self.empty))
+        return self.result
+
+    def evaluate(self):
+        if self.model:
+            return self.model.score(learned_eval.bit_features([self.board()], self.tables.nbits))[0]
+        return self.heuristic(self.grid) + self.threat_parity()
+
+    def evaluate_moves(self, moves):
+        # scores after each move, the finished positions by result and the rest by one model call
+        scores, boards, pending = [], [], []
+        for i, col in enumerate(moves):
+            self.make(col)
+            scores.append(self.terminal())
+            if self.result is None:
+                boards.append(self.board())
+                pending.append(i)
+            self.unmake(col)
+        if boards:
+            for i, score in zip(pending, self.model.score(learned_eval.bit_features(boards, self.tables.nbits))):
+                scores[i] = score
+        return scores
+
+    def turn(self):
+        return 1 if self.player == "X" else -1
+
+    # ---------------- learned evaluation ----------------
+    def board(self):
+        return self.bits["X"], self.bits["O"]
+
+    def features(self):
+        # the model's inputs for this position: X's cells, then O's
+        return learned_eval.bit_features([self.board()], self.tables.nbits)[0]
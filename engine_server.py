@@ -0,0 +1,299 @@
+"""Resident Connect 4 / Checkers engine speaking a small UCI-like protocol.
+
+    python engine_server.py connect4
+    python engine_server.py checkers --workers 4
+
+Commands, one per line on stdin:
+
+    isready                         answers readyok
+    newgame                         back to the start position (tables stay warm)
+    position startpos [moves M ...]
+    position <board> [moves M ...]  connect4: grid_tag() picture, e.g. ......./.../...X...
+                                    checkers: board_tag() picture plus RED or BLUE to move
+    go [depth N] [movetime MS] [infinite]
+    stop                            ends the search, bestmove comes with what it found so far
+    show                            prints the current position
+    quit
+
+Moves are a column (0-6) for Connect 4 and "r,c-r,c" for Checkers. While
+thinking the engine prints "info depth D score S nodes N time MS" after
+every finished iteration, with the score from X's / BLUE's point of view,
+and ends with "bestmove M" ("bestmove none" when the game is over). A
+Checkers move from the opening book is played without a search, so no
+info lines come before its bestmove. A new position or go stops the
+running search first. Anything the engine cannot use is answered with
+"info string".
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+from game_search import SearchCancelled
+
+# ================= GAMES =================
+class Connect4Engine:
+    default_depth = 8
+    max_depth = 42
+
+    def __init__(self, args):
+        from connect4_search import Connect4Position, analysis_cache, centre_heuristic, grid_tag
+        from game_search import Searcher
+        self.Position = Connect4Position
+        self.heuristic = centre_heuristic
+        self.grid_tag = grid_tag
+        self.searcher = Searcher(store=analysis_cache())
+        self.new_game()
+
+    def new_game(self):
+        self.grid = [[" "] * 7 for _ in range(6)]
+
+    def set_board(self, words):
+        rows = [list(row.replace(".", " ")) for row in words[0].split("/")]
+        if len(words) != 1 or len(rows) != 6 or any(len(row) != 7 or set(row) - set("XO ") for row in rows):
+            raise ValueError(f"bad grid {' '.join(words)}")
+        if any(rows[r][c] != " " and rows[r + 1][c] == " " for r in range(5) for c in range(7)):
+            raise ValueError(f"floating disc in {words[0]}")
+        x, o = (sum(row.count(p) for row in rows) for p in "XO")
+        if x - o not in (0, 1):   # X moves first
+            raise ValueError(f"{x} X and {o} O can't happen in {words[0]}")
+        self.grid = rows
+
+    def save(self):
+        # what restore() needs to undo set_board() and play(), which replace the grid rather than change it
+        return self.grid
+
+    def restore(self, saved):
+        self.grid = saved
+
+    def moves(self):
+        pos = self.Position(self.grid, self.heuristic)
+        return [] if pos.terminal() is not None else pos.columns()
+
+    def play(self, text):
+        if not text.isdigit() or int(text) not in self.moves():
+            raise ValueError(f"illegal move {text}")
+        pos = self.Position(self.grid, self.heuristic)
+        pos.make(int(text))
+        self.grid = pos.grid
+
+    def search(self, depth, stop, report):
+        # (value, move) for the side to move; report(depth, value, move, stats) after every finished depth
+        searcher = self.searcher
+        return searcher.search(self.Position(self.grid, self.heuristic), depth, stop,
+                               on_depth=lambda d, value, move: report(d, value, move, searcher.stats))
+
+    def format(self, move):
+        return str(move)
+
+    def show(self):
+        return self.grid_tag(self.grid)
+
+    def close(self):
+        pass
+
+class CheckersEngine:
+    default_depth = 6
+    max_depth = 64
+
+    def __init__(self, args):
+        # pygame's greeting would otherwise land on stdout, in the middle of the protocol
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        import Checkers
+        self.game = Checkers
+        if args.workers > 1:
+            self.pool = Checkers.RootSearchPool(args.workers)
+        else:
+            self.pool = None
+        self.new_game()
+
+    def new_game(self):
+        self.board = self.game.Board()
+        self.color = self.game.RED   # RED opens, as in the GUI
+
+    def set_board(self, words):
+        self.board, self.color = self.game.board_from_tag(" ".join(words))
+
+    def save(self):
+        return self.board, self.color
+
+    def restore(self, saved):
+        self.board, self.color = saved
+
+    def moves(self):
+        return self.game.SearchPosition(self.board, self.color).moves()
+
+    def play(self, text):
+        for move in self.moves():
+            if self.format(move) == text:
+                self.board = self.game.play(self.board, move)
+                self.color = self.game.BLUE if self.color == self.game.RED else self.game.RED
+                return
+        raise ValueError(f"illegal move {text}")
+
+    def search(self, depth, stop, report):
+        max_player = self.color == self.game.BLUE
+        move = self.game.book_move(self.board, self.color)   # as choose_move does, when the book is loaded
+        if move:
+            return None, move
+        if not self.pool:
+            return self.game.search(self.board, depth, max_player, stop, on_depth=lambda d, value, move:
+                                    report(d, value, move, self.game.SEARCHER.stats))
+        found = self.game.tb_root(self.board, max_player)
+        if found:
+            return found
+        # the pool searches one depth at a time; the workers' tables keep the earlier depths
+        for d in range(1, depth + 1):
+            value, move = self.pool.search(self.board, d, max_player, stop)
+            report(d, value, move, self.pool.stats)
+        return value, move
+
+    def format(self, move):
+        (r, c), (tr, tc), _ = move
+        return f"{r},{c}-{tr},{tc}"
+
+    def show(self):
+        return self.game.board_tag(self.board, self.color)
+
+    def close(self):
+        if self.pool:
+            self.pool.close()
+
+ENGINES = {"connect4": Connect4Engine, "checkers": CheckersEngine}
+
+# ================= PROTOCOL =================
+class EngineServer:
+    def __init__(self, engine, out=sys.stdout):
+        self.engine = engine
+        self.out = out
+        self.out_lock = threading.Lock()
+        self.thinker = None
+        self.stop = threading.Event()
+
+    def send(self, line):
+        with self.out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def serve(self, lines):
+        for line in lines:
+            words = line.split()
+            if not words:
+                continue
+            command, args = words[0], words[1:]
+            if command == "quit":
+                break
+            handler = getattr(self, "cmd_" + command, None)
+            if handler is None:
+                self.send(f"info string unknown command {command}")
+                continue
+            try:
+                handler(args)
+            except ValueError as e:
+                self.send(f"info string {e}")
+        self.halt()
+        self.engine.close()
+
+    def halt(self):
+        # stop a running search and wait for its bestmove
+        if self.thinker:
+            self.stop.set()
+            self.thinker.join()
+            self.thinker = None
+
+    def cmd_isready(self, args):
+        self.send("readyok")
+
+    def cmd_newgame(self, args):
+        self.halt()
+        self.engine.new_game()
+
+    def cmd_position(self, args):
+        self.halt()
+        if "moves" in args:
+            at = args.index("moves")
+            setup, moves = args[:at], args[at + 1:]
+        else:
+            setup, moves = args, []
+        if not setup:
+            raise ValueError("position needs startpos or a board")
+        saved = self.engine.save()
+        try:
+            if setup == ["startpos"]:
+                self.engine.new_game()
+            else:
+                self.engine.set_board(setup)
+            for move in moves:
+                self.engine.play(move)
+        except ValueError:
+            self.engine.restore(saved)   # a bad board or move leaves the previous position in place
+            raise
+
+    def cmd_go(self, args):
+        self.halt()
+        depth = movetime = None
+        infinite = False
+        i = 0
+        while i < len(args):
+            if args[i] == "infinite":
+                infinite = True
+                i += 1
+            elif args[i] in ("depth", "movetime") and i + 1 < len(args) and args[i + 1].isdigit():
+                if args[i] == "depth":
+                    depth = int(args[i + 1])
+                else:
+                    movetime = int(args[i + 1])
+                i += 2
+            else:
+                raise ValueError(f"bad go argument {args[i]}")
+        if depth is None:
+            depth = self.engine.max_depth if movetime is not None or infinite else self.engine.default_depth
+        depth = max(1, min(depth, self.engine.max_depth))   # depth 0 would leave the search nothing to answer with
+
+        self.stop = threading.Event()   # a fresh one, so an old movetime timer can't end this search
+        if movetime is not None:
+            timer = threading.Timer(movetime / 1000, self.stop.set)
+            timer.daemon = True
+            timer.start()
+        self.thinker = threading.Thread(target=self.think, args=(depth, self.stop), daemon=True)
+        self.thinker.start()
+
+    def cmd_stop(self, args):
+        self.halt()
+
+    def cmd_show(self, args):
+        self.halt()
+        self.send(f"position {self.engine.show()}")
+
+    def think(self, depth, stop):
+        # one deepening search up to depth, the movetime timer or stop; every finished depth is a usable answer
+        start = time.perf_counter()
+        moves = self.engine.moves()
+        best = moves[0] if moves else None   # stopped before depth 1 finished
+
+        def report(d, value, move, stats):
+            nonlocal best
+            best = move
+            self.send(f"info depth {d} score {value} nodes {stats['nodes']} "
+                      f"time {(time.perf_counter() - start) * 1000:.0f}")
+
+        if moves:
+            try:
+                value, move = self.engine.search(depth, stop, report)
+                if move is not None:
+                    best = move   # also when no depth was searched, as for a tablebase position
+            except SearchCancelled:
+                pass
+        self.send(f"bestmove {self.engine.format(best) if best is not None else 'none'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a game engine over stdin/stdout.")
+    parser.add_argument("game", choices=sorted(ENGINES))
+    parser.add_argument("--workers", type=int, default=1, help="checkers root-split processes")
+    args = parser.parse_args()
+    engine = ENGINES[args.game](args)
+    EngineServer(engine).serve(sys.stdin)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
+import argparse
+import time
+
+import game_record
+from connect4_search import Connect4Position, analysis_cache, grid_tag
+from game_search import Searcher
+from move_profiler import profiled
+
 class Connect4:
     ROWS = 6
     COLS = 7
 
     def __init__(self):
         self.initial_grid = [[" " for _ in range(self.COLS)] for _ in range(self.ROWS)]
+        self.searcher = None   # made on the computer's first move, so a replay never opens the analysis cache
 
     # ____________________________________________________________________
     def display_grid(self, state):
@@ -76,44 +85,23 @@ class Connect4:
         return score
 
     # ____________________________________________________________________
-    def MinMax(self, state, depth, alpha, beta, maximizing):
-        terminal = self.check_terminal(state)
-        if terminal != "Not terminal" or depth == 0:
-            return terminal if terminal != "Not terminal" else self.heuristic(state)
-
-        if maximizing:
-            value = -float('inf')
-            for action in self.available_actions(state):
-                value = max(value, self.MinMax(self.take_action(state, action), depth-1, alpha, beta, False))
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-            return value
-        else:
-            value = float('inf')
-            for action in self.available_actions(state):
-                value = min(value, self.MinMax(self.take_action(state, action), depth-1, alpha, beta, True))
-                beta = min(beta, value)
-                if alpha >= beta:
-                    break
-            return value
-
-    # ____________________________________________________________________
+    @profiled(lambda self, state, depth=4: (grid_tag(state), depth + 1))
     def computer_play(self, state, depth=4):
         player = self.current_player(state)
         print(f"Computer ({player}) turn")
-        actions = self.available_actions(state)
-        scores = []
-        for action in actions:
-            next_state = self.take_action(state, action)
-            score = self.MinMax(next_state, depth, -float('inf'), float('inf'), player == 'O')
-            scores.append(score)
-        best = max(scores) if player == 'X' else min(scores)
-        index = scores.index(best)
-        new_state = self.take_action(state, actions[index])
+        if self.searcher is None:
+            self.searcher = Searcher(store=analysis_cache())
+        # depth counts the replies after the computer's own move, hence depth + 1 plies
+        _, col = self.searcher.search(Connect4Position(state, self.heuristic), depth + 1)
+        new_state = self.take_action(state, (player, col))
         self.display_grid(new_state)
         return new_state
 
+    # ____________________________________________________________________
+    def played_column(self, before, after):
+        # the column a move dropped into, from the grids before and after it
+        return next(c for c in range(self.COLS) if any(before[r][c] != after[r][c] for r in range(self.ROWS)))
+
     # ____________________________________________________________________
     def human_play(self, state):
         self.display_grid(state)
@@ -123,28 +111,70 @@ class Connect4:
 
 
 # ============================ GAME LOOP ============================
+def play():
+    game = Connect4()
+    state = game.initial_grid
+    moves = []
 
-game = Connect4()
-state = game.initial_grid
-
-print("Choose mode:\n1) Human vs Human\n2) Human vs AI\n3) AI vs AI")
-mode = int(input("Your choice: "))
+    print("Choose mode:\n1) Human vs Human\n2) Human vs AI\n3) AI vs AI")
+    mode = int(input("Your choice: "))
 
-while game.check_terminal(state) == "Not terminal":
-    if mode == 1:
-        state = game.human_play(state)
-    elif mode == 2:
-        if game.current_player(state) == 'X':
+    while game.check_terminal(state) == "Not terminal":
+        before = state
+        if mode == 1:
             state = game.human_play(state)
+        elif mode == 2:
+            if game.current_player(state) == 'X':
+                state = game.human_play(state)
+            else:
+                state = game.computer_play(state)
         else:
             state = game.computer_play(state)
+        moves.append(game.played_column(before, state))
+
+    result = game.check_terminal(state)
+    if result == 1:
+        print("X wins!")
+    elif result == -1:
+        print("O wins!")
+    else:
+        print("Draw!")
+    game_record.write("connect4", "6x7k4", game_record.CONNECT4_RESULTS[result], moves, mode=mode, depth=5)
+
+# ============================ REPLAY ============================
+def replay(paths, index=None, delay=0.0):
+    # print recorded 6x7 games move by move, with no input needed
+    game = Connect4()
+    count = 0
+    for path, number, record in game_record.read(paths):
+        if isinstance(record, ValueError):
+            print(f"{path}:{number}: {record}")
+            continue
+        if record.game != "connect4" or record.variant != "6x7k4":
+            continue
+        count += 1
+        if index is not None and count != index:
+            continue
+        print(f"===== game {count} ({path}:{number}) {' '.join(f'{k}={v}' for k, v in record.info.items())}")
+        state = game.initial_grid
+        for ply, col in enumerate(record.moves, 1):
+            player = game.current_player(state)
+            if (player, col) not in game.available_actions(state):
+                print(f"move {ply}: column {col} is not playable, record stops here")
+                break
+            state = game.take_action(state, (player, col))
+            print(f"move {ply}: {player} -> column {col}")
+            game.display_grid(state)
+            time.sleep(delay)
+        print(f"result: {record.result}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Console Connect 4.")
+    parser.add_argument("--replay", nargs="+", metavar="FILE", help="replay recorded games instead of playing")
+    parser.add_argument("--game", type=int, help="only the n-th Connect 4 game of the files (from 1)")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds between replayed moves")
+    args = parser.parse_args()
+    if args.replay:
+        replay(args.replay, args.game, args.delay)
     else:
-        state = game.computer_play(state)
-
-result = game.check_terminal(state)
-if result == 1:
-    print("X wins!")
-elif result == -1:
-    print("O wins!")
-else:
-    print("Draw!")
+        play()
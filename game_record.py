@@ -0,0 +1,149 @@
+"""Compact game records for the Connect 4, Checkers and Memory games.
+
+Every finished game appends one line to <dir>/<game>.rec. The directory
+is game_records next to this file, or $GAME_RECORD_DIR when that is set
+(GAME_RECORD_DIR= with an empty value turns recording off). A line reads
+
+    <game> <variant> <result> <moves> [key=value ...]
+
+for example
+
+    connect4 6x7k4 X 33224401 mode=PVA depth=4 when=2026-10-19T15:02:11
+    checkers 8x8 BLUE mhkgrncj... mode=AVA depth=3 when=...
+    memory 4x4:38172645... 1 0b0a0c... mode=CVC level=Hard when=...
+
+Moves are fixed-width codes from a 64-character alphabet, with no
+separators ("-" for a game without moves):
+- connect4: one character per drop, the column.
+- checkers: two characters per move, the from and to squares, numbered
+  like checkers_tablebase.rc_square (r * 4 + c // 2).
+- memory: two characters per flip, the card index r * cols + c. The
+  variant carries the deal after the colon, one character per card
+  value.
+
+Results:
+- connect4: X, O or D.
+- checkers: RED, BLUE or DRAW.
+- memory: 1, 2 or 0 for a draw.
+"""
+import os
+import time
+
+from checkers_tablebase import rc_square, square_rc
+
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ-_"
+WIDTH = {"connect4": 1, "checkers": 2, "memory": 2}   # characters per move
+CONNECT4_RESULTS = {1: "X", -1: "O", 0: "D"}          # from the games' terminal scores
+
+_env_dir = os.environ.get("GAME_RECORD_DIR")
+RECORD_DIR = (os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_records")
+              if _env_dir is None else _env_dir)
+
+class Record:
+    def __init__(self, game, variant, result, moves, info=None):
+        self.game = game
+        self.variant = variant
+        self.result = result
+        self.moves = moves       # decoded: columns, ((r, c), (r, c)) pairs or card indices
+        self.info = info or {}
+
+    def line(self):
+        fields = [self.game, self.variant, self.result, encode_moves(self.game, self.moves)]
+        fields += [f"{key}={value}" for key, value in self.info.items()]
+        return " ".join(fields)
+
+# ================= MOVES =================
+def encode_number(n, width):
+    if not 0 <= n < len(ALPHABET) ** width:
+        raise ValueError(f"{n} does not fit {width} character(s)")
+    digits = []
+    for _ in range(width):
+        n, d = divmod(n, len(ALPHABET))
+        digits.append(ALPHABET[d])
+    return "".join(reversed(digits))
+
+def decode_number(text):
+    n = 0
+    for ch in text:
+        d = ALPHABET.find(ch)
+        if d < 0:
+            raise ValueError(f"bad character {ch!r}")
+        n = n * len(ALPHABET) + d
+    return n
+
+def encode_moves(game, moves):
+    if game == "checkers":
+        text = "".join(encode_number(rc_square(*start), 1) + encode_number(rc_square(*end), 1)
+                       for start, end in moves)
+    else:
+        text = "".join(encode_number(m, WIDTH[game]) for m in moves)
+    return text or "-"
+
+def decode_moves(game, text):
+    width = WIDTH.get(game)
+    if width is None:
+        raise ValueError(f"unknown game {game!r}")
+    if text == "-":
+        return []
+    if len(text) % width:
+        raise ValueError(f"{game} moves come in groups of {width} characters")
+    if game == "checkers":
+        return [(square_rc(decode_number(text[i])), square_rc(decode_number(text[i + 1])))
+                for i in range(0, len(text), 2)]
+    return [decode_number(text[i:i + width]) for i in range(0, len(text), width)]
+
+def deal_variant(rows, cols, values):
+    # "RxC:<deal>" for a Memory board, values listed card by card
+    return f"{rows}x{cols}:" + "".join(encode_number(v, 1) for v in values)
+
+def parse_deal(variant):
+    # (rows, cols, values) back from deal_variant()
+    size, _, deal = variant.partition(":")
+    rows, cols = map(int, size.split("x"))
+    values = [decode_number(ch) for ch in deal]
+    if len(values) != rows * cols:
+        raise ValueError(f"bad deal {variant!r}")
+    return rows, cols, values
+
+# ================= FILES =================
+def parse(line):
+    # Record from one line; ValueError when it is malformed
+    fields = line.split()
+    if len(fields) < 4:
+        raise ValueError(f"bad record {line.strip()!r}")
+    game, variant, result, moves = fields[:4]
+    info = {}
+    for field in fields[4:]:
+        key, sep, value = field.partition("=")
+        if not sep:
+            raise ValueError(f"bad field {field!r}")
+        info[key] = value
+    return Record(game, variant, result, decode_moves(game, moves), info)
+
+def read(paths):
+    # (path, line number, Record or ValueError) for every line of the files, one line in memory at a time
+    for path in paths:
+        with open(path) as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield path, number, parse(line)
+                except ValueError as e:
+                    yield path, number, e
+
+def write(game, variant, result, moves, **info):
+    # append a finished game; recording is best effort, so the path or None when it can't be written
+    if not RECORD_DIR:
+        return None
+    info.setdefault("when", time.strftime("%Y-%m-%dT%H:%M:%S"))
+    record = Record(game, variant, result, moves, info)
+    path = os.path.join(RECORD_DIR, f"{game}.rec")
+    try:
+        line = record.line()
+        os.makedirs(RECORD_DIR, exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line + "\n")
+    except (OSError, ValueError):
+        return None
+    return path
@@ -0,0 +1,250 @@
+"""Adversarial search shared by the Connect 4 and Checkers AIs.
+
+A game plugs in by handing Searcher a position object with:
+
+    moves()       legal moves for the side to move, likely best first
+    make(move)    play move in place and return whatever unmake() needs
+    unmake(undo)  take it back
+    key()         hashable key of the position, side to move included
+    terminal()    None while the game goes on, else its final score
+    evaluate()    heuristic score of a position that is not over
+    turn()        1 when the maximizing side is to move, -1 otherwise
+
+and optionally
+
+    orient(move)  for games whose key() folds symmetric positions together:
+                  maps a move between the position's own frame and the
+                  frame of its key (and back; it is its own inverse)
+    evaluate_moves(moves)
+                  with a true batch attribute: the scores of the positions
+                  after each of moves, terminal() results included, in one
+                  call; nodes one ply above the horizon then score all
+                  their children at once instead of one evaluate() each
+
+Scores coming in and going out are from the maximizing side's point of
+view, the way every game here already scores; inside, the search is
+negamax with alpha-beta, iterative deepening and a transposition table.
+A side left without moves that terminal() did not score has lost, as in
+Checkers; terminal() runs at every node, so it should be cheap.
+"""
+import math
+import os
+import signal
+import time
+
+EXACT, LOWER, UPPER = 0, 1, 2   # what a stored value is: exact, a lower bound or an upper bound
+CHECK_EVERY = 256               # nodes between looks at the stop event and the deadline
+LOST = 10 ** 9                  # stands in for a search's -inf / inf where JSON has to hold it
+
+class SearchCancelled(Exception):
+    pass
+
+def finite(value):
+    return value if math.isfinite(value) else math.copysign(LOST, value)
+
+def init_worker():
+    # initializer for pool processes that search Checkers: it runs pygame.init(), after which
+    # SDL turns SIGTERM into a QUIT event, so import it up front (its greeting kept off
+    # stdout) and restore SIGTERM so Pool.terminate() still ends the worker
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import Checkers  # noqa: F401
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def new_stats():
+    return {"nodes": 0, "tt_hits": 0, "cutoffs": 0, "depth": 0, "time": 0.0}
+
+class Searcher:
+    # keeps its transposition table between searches, so one instance should live as long as the AI;
+    # with an analysis_cache store the table also survives from one session to the next
+    def __init__(self, table_size=1 << 20, store=None):
+        self.table = {}   # key -> (depth, value, flag, best move), value for the side to move
+        self.table_size = table_size
+        self.store = store
+        self.keep_depth = store.min_depth if store else math.inf
+        self.pending = set()   # keys of entries deep enough to write to the store
+        if store:
+            self.table.update(store.load())
+        self.stats = new_stats()
+        self.stop = None
+        self.deadline = None
+        self.orient = None
+        self.batch = None
+
+    def search(self, pos, depth, stop=None, deadline=None, on_depth=None):
+        """(value, move) for the side to move in pos, deepening one ply at a time up to depth.
+
+        stop is a threading/multiprocessing Event that cancels the search with
+        SearchCancelled. deadline is a time.perf_counter() value; once it
+        passes, the result of the deepest finished iteration is returned
+        (depth 1 always finishes). move is None when pos is already over.
+        on_depth(depth, value, move) is called after every finished
+        iteration, with stats counting the whole search so far; a search
+        that reports its iterations runs them even when the table already
+        holds the answer.
+        """
+        self.begin(pos, stop)
+        start = time.perf_counter()
+        result = pos.terminal()
+        if result is not None:
+            return result, None
+        moves = pos.moves()
+        if not moves:
+            return -math.inf * pos.turn(), None
+        if depth < 1:
+            return pos.evaluate(), None
+
+        # a position already searched this deep (now or in an earlier session) needs no search
+        entry = self.table.get(pos.key())
+        if entry and entry[0] >= depth and entry[2] == EXACT and on_depth is None:
+            move = self.oriented(entry[3])
+            if move in moves:
+                self.stats["depth"] = entry[0]
+                self.stats["tt_hits"] += 1
+                return pos.turn() * entry[1], move
+
+        best = None
+        try:
+            for d in range(1, depth + 1):
+                try:
+                    best = self.root(pos, d)
+                except SearchCancelled:
+                    if best is None or (stop is not None and stop.is_set()):
+                        raise
+                    break
+                self.stats["depth"] = d
+                if on_depth:
+                    on_depth(d, *best)
+                if d == 1:
+                    self.deadline = deadline   # the first iteration runs to completion
+        finally:
+            self.flush()
+        self.stats["time"] = time.perf_counter() - start
+        return best
+
+    def value(self, pos, depth, alpha=-math.inf, beta=math.inf, stop=None):
+        # fail-soft score of pos within (alpha, beta), for callers that run their own root loop
+        self.begin(pos, stop)
+        color = pos.turn()
+        if color == 1:
+            return self.negamax(pos, depth, alpha, beta, 1)
+        return -self.negamax(pos, depth, -beta, -alpha, -1)
+
+    def begin(self, pos, stop):
+        if len(self.table) > self.table_size:
+            self.flush()
+            self.table.clear()
+        self.stats = new_stats()
+        self.stop = stop
+        self.deadline = None
+        self.orient = getattr(pos, "orient", None)
+        self.batch = pos.evaluate_moves if getattr(pos, "batch", False) else None
+
+    def flush(self):
+        # one batch per search: the deep entries found since the last one
+        if self.store and self.pending:
+            table = self.table
+            self.store.save([(key, table[key]) for key in self.pending if key in table])
+        self.pending.clear()
+
+    def oriented(self, move):
+        return self.orient(move) if self.orient and move is not None else move
+
+    def remember(self, key, depth, value, flag, move):
+        self.table[key] = (depth, value, flag, self.oriented(move))
+        if depth >= self.keep_depth:
+            self.pending.add(key)
+
+    def root(self, pos, depth):
+        color = pos.turn()
+        entry = self.table.get(pos.key())
+        moves = pos.moves()
+        rank = {move: i for i, move in enumerate(moves)}
+        alpha, beta = -math.inf, math.inf
+        best_value, best_move = -math.inf, moves[0]
+        # scores are integers, so searching one point below alpha returns exact values for
+        # moves that tie the best; ties go to the game's own move order whatever the table
+        # puts first, which is also how Checkers' RootSearchPool breaks them
+        for move in self.ordered(moves, self.oriented(entry[3]) if entry else None):
+            undo = pos.make(move)
+            try:
+                v = -self.negamax(pos, depth - 1, -beta, -(alpha - 1), -color)
+            finally:
+                pos.unmake(undo)
+            if v > best_value or (v == best_value and rank[move] < rank[best_move]):
+                best_value, best_move = v, move
+            alpha = max(alpha, v)
+        self.remember(pos.key(), depth, best_value, EXACT, best_move)
+        return color * best_value, best_move
+
+    def negamax(self, pos, depth, alpha, beta, color):
+        stats = self.stats
+        stats["nodes"] += 1
+        if not stats["nodes"] % CHECK_EVERY:
+            if self.stop is not None and self.stop.is_set():
+                raise SearchCancelled()
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchCancelled()
+
+        result = pos.terminal()
+        if result is not None:
+            return color * result
+        if depth == 0:
+            return color * pos.evaluate()
+
+        key = pos.key()
+        entry = self.table.get(key)
+        tt_move = None
+        if entry:
+            e_depth, e_value, flag, tt_move = entry
+            tt_move = self.oriented(tt_move)
+            if e_depth >= depth:
+                stats["tt_hits"] += 1
+                if flag == EXACT:
+                    return e_value
+                if flag == LOWER:
+                    alpha = max(alpha, e_value)
+                else:
+                    beta = min(beta, e_value)
+                if alpha >= beta:
+                    return e_value
+
+        moves = pos.moves()
+        if not moves:
+            return -math.inf
+
+        if depth == 1 and self.batch:
+            # every child is a leaf: score them together, which also makes the value exact
+            stats["nodes"] += len(moves)
+            best_value, best_move = -math.inf, None
+            for move, v in zip(moves, self.batch(moves)):
+                if color * v > best_value:
+                    best_value, best_move = color * v, move
+            self.remember(key, depth, best_value, EXACT, best_move)
+            return best_value
+
+        start_alpha = alpha
+        best_value, best_move = -math.inf, None
+        for move in self.ordered(moves, tt_move):
+            undo = pos.make(move)
+            try:
+                v = -self.negamax(pos, depth - 1, -beta, -alpha, -color)
+            finally:
+                pos.unmake(undo)
+            if v > best_value:
+                best_value, best_move = v, move
+                if v > alpha:
+                    alpha = v
+                    if alpha >= beta:
+                        stats["cutoffs"] += 1
+                        break
+
+        flag = UPPER if best_value <= start_alpha else LOWER if best_value >= beta else EXACT
+        self.remember(key, depth, best_value, flag, best_move)
+        return best_value
+
+    @staticmethod
+    def ordered(moves, first):
+        # the stored best move goes first, the rest keep the game's own order
+        if first is None or first not in moves:
+            return moves
+        return [first] + [m for m in moves if m != first]
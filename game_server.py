@@ -0,0 +1,529 @@
+"""Asyncio server hosting many Connect 4, Checkers and Memory games at once.
+
+    python game_server.py --port 8765 --workers 4
+    python game_server.py --unix /tmp/playground.sock
+    python load_client.py --sessions 200 --duration 30      measure it
+
+Clients send one JSON object per line over localhost TCP (or a unix
+socket with --unix) and get one back per request. A request may carry an
+"id", which is echoed in its reply. The requests of one connection run
+concurrently, so their replies can come back out of order.
+
+    {"op": "new", "game": "connect4", "variant": "6x7k4"}     -> {"session": "connect4-1", "state": {...}}
+    {"op": "new", "game": "checkers"}
+    {"op": "new", "game": "memory", "variant": "4x4", "level": "Hard"}
+    {"op": "move", "session": S, "move": M}    a column, [[r, c], [r, c]] or a card index
+    {"op": "ai", "session": S, "depth": N, "deadline_ms": T}
+    {"op": "state", "session": S}
+    {"op": "close", "session": S}
+    {"op": "stats"}                            latency percentiles per game and op
+
+Every state lists "moves", the legal moves of the side to move, and
+"over", plus "result" once the game has ended. Errors come back as
+{"error": ...}. The error "busy" means the AI queue was full and the
+request can be retried.
+
+AI moves for Connect 4 and Checkers go to a shared process pool. The
+requests wait in a queue of at most --queue; beyond that they are
+answered "busy" at once. Whenever a worker is free, up to --batch waiting
+requests go to it as one task. Each request has a deadline (deadline_ms,
+--deadline by default). The search deepens only until its deadline, and
+requests sharing a batch split the time each has left. A request that is
+still waiting when its deadline passes is answered "deadline" without
+being searched. Memory's AI only recalls cards, so it answers in the
+server process.
+
+Sessions belong to the connection that opened them and end with it.
+"""
+import argparse
+import asyncio
+import collections
+import functools
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import game_record
+from connect4_search import CONNECT, Connect4Position, centre_heuristic, grid_tag
+from game_search import finite, init_worker
+
+DEPTH = {"connect4": 8, "checkers": 6}        # AI search depth unless the request asks for another
+MAX_DEPTH = {"connect4": 42, "checkers": 64}
+GRACE = 0.25        # seconds past a deadline the server waits for a worker to report back
+STATS_KEEP = 10000  # latencies kept per game and op for the percentiles
+
+# ================= SESSIONS =================
+class Connect4Session:
+    game = "connect4"
+
+    def __init__(self, variant=None, **options):
+        try:
+            size, _, k = (variant or f"6x7k{CONNECT}").partition("k")
+            rows, cols = map(int, size.split("x"))
+            k = int(k)
+        except ValueError:
+            raise ValueError(f"bad variant {variant!r}, expected e.g. 6x7k4")
+        if not (4 <= rows <= 12 and 4 <= cols <= 12 and 3 <= k <= max(rows, cols)):
+            raise ValueError(f"unsupported board {variant}")
+        self.variant = f"{rows}x{cols}k{k}"
+        self.pos = Connect4Position([[" "] * cols for _ in range(rows)], centre_heuristic, k)
+        self.thinking = False
+
+    @property
+    def over(self):
+        return self.pos.terminal() is not None
+
+    def state(self):
+        state = {"board": grid_tag(self.pos.grid), "turn": self.pos.player,
+                 "moves": [] if self.over else self.pos.columns(), "over": self.over}
+        if self.over:
+            state["result"] = game_record.CONNECT4_RESULTS[self.pos.result]
+        return state
+
+    def play(self, move):
+        if type(move) is not int or self.over or move not in self.pos.columns():
+            raise ValueError(f"illegal move {move!r}")
+        self.pos.make(move)
+
+    def ai_job(self, depth, deadline):
+        return ("connect4", self.variant, grid_tag(self.pos.grid), depth, deadline)
+
+class CheckersSession:
+    game = "checkers"
+
+    def __init__(self, variant=None, **options):
+        import Checkers
+        self.Checkers = Checkers
+        self.board = Checkers.Board()
+        self.color = Checkers.RED   # RED opens, as in the GUI
+        self.thinking = False
+
+    def moves(self):
+        return self.Checkers.SearchPosition(self.board, self.color).moves()
+
+    @property
+    def over(self):
+        return not self.moves()
+
+    def state(self):
+        Checkers = self.Checkers
+        moves = [[list(m[0]), list(m[1])] for m in self.moves()]
+        state = {"board": Checkers.board_tag(self.board, self.color),
+                 "turn": "BLUE" if self.color == Checkers.BLUE else "RED", "moves": moves, "over": not moves}
+        if not moves:   # a side left without moves has lost
+            state["result"] = "RED" if self.color == Checkers.BLUE else "BLUE"
+        return state
+
+    def play(self, move):
+        try:
+            (r, c), (tr, tc) = move
+            step = ((r, c), (tr, tc))
+        except (TypeError, ValueError):
+            raise ValueError(f"bad move {move!r}, expected [[r, c], [r, c]]")
+        for m in self.moves():
+            if m[:2] == step:
+                Checkers = self.Checkers
+                self.board = Checkers.play(self.board, m)
+                self.color = Checkers.BLUE if self.color == Checkers.RED else Checkers.RED
+                return
+        raise ValueError(f"illegal move {move!r}")
+
+    def ai_job(self, depth, deadline):
+        return ("checkers", self.Checkers.board_tag(self.board, self.color), depth, deadline)
+
+class MemorySession:
+    game = "memory"
+
+    def __init__(self, variant=None, level="Hard", **options):
+        from MemoryGame import AI_LEVELS, AIPlayer, MemoryState
+        try:
+            rows, cols = map(int, (variant or "4x4").split("x"))
+        except ValueError:
+            raise ValueError(f"bad variant {variant!r}, expected e.g. 4x4")
+        if not (2 <= rows <= 8 and 2 <= cols <= 8) or rows * cols % 2:
+            raise ValueError(f"unsupported board {variant}")
+        if level not in AI_LEVELS:
+            raise ValueError(f"level is one of {', '.join(AI_LEVELS)}")
+        self.cards = MemoryState(rows, cols)
+        self.ai = AIPlayer(list(self.cards.values), *AI_LEVELS[level])
+        self.thinking = False
+
+    @property
+    def over(self):
+        return self.cards.over()
+
+    def state(self):
+        s = self.cards
+        index = lambda pos: pos[0] * s.cols + pos[1]
+        state = {"turn": s.turn, "scores": {str(p): n for p, n in s.scores.items()},
+                 "matched": sorted(index(pos) for pos in s.matched),
+                 "moves": [index(pos) for pos in s.values if s.can_flip(pos)] if not self.over else [],
+                 "over": self.over}
+        if s.first is not None:
+            state["face_up"] = [index(s.first), s.values[s.first]]
+        if self.over:
+            state["result"] = s.winner()
+        return state
+
+    def flip(self, pos):
+        # [index, value] of the flipped card; the second flip of a turn settles it
+        s = self.cards
+        value = s.flip(pos)
+        self.ai.remember(pos, value)
+        if s.second is not None:
+            first, second = s.first, s.second
+            if s.resolve():
+                self.ai.matched(first, second)
+        return [pos[0] * s.cols + pos[1], value]
+
+    def play(self, move):
+        s = self.cards
+        pos = divmod(move, s.cols) if type(move) is int else None
+        if pos not in s.values or self.over or not s.can_flip(pos):
+            raise ValueError(f"illegal move {move!r}")
+        return [self.flip(pos)]
+
+    def ai_turn(self):
+        # the AI's whole turn: pairs of flips until one misses or the game ends
+        s = self.cards
+        if s.first is not None:
+            raise ValueError("finish the turn first")
+        player, flips = s.turn, []
+        while not self.over and s.turn == player:
+            first = self.ai.choose()
+            flips.append(self.flip(first))
+            flips.append(self.flip(self.ai.choose(first)))
+        return flips
+
+SESSIONS = {"connect4": Connect4Session, "checkers": CheckersSession, "memory": MemorySession}
+
+# ================= AI POOL =================
+_searchers = {}   # Connect 4 variant -> Searcher, one per worker process so the tables stay warm
+
+def _init_worker():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl-C is for the server, which shuts the pool down
+    init_worker()
+
+def ai_move(job, stop_at):
+    # {"move", "value", "depth"} for job, searching until the time.time() stop_at
+    deadline = time.perf_counter() + (stop_at - time.time())
+    if job[0] == "connect4":
+        from game_search import Searcher
+        _, variant, tag, depth, _ = job
+        grid = [list(row.replace(".", " ")) for row in tag.split("/")]
+        if variant not in _searchers:
+            _searchers[variant] = Searcher()
+        searcher = _searchers[variant]
+        value, move = searcher.search(Connect4Position(grid, centre_heuristic, int(variant.partition("k")[2])),
+                                      depth, deadline=deadline)
+        return {"move": move, "value": finite(value), "depth": searcher.stats["depth"]}
+    import Checkers
+    _, tag, depth, _ = job
+    board, color = Checkers.board_from_tag(tag)
+    value, move = Checkers.search(board, depth, color == Checkers.BLUE, deadline=deadline)
+    return {"move": [list(move[0]), list(move[1])], "value": finite(value), "depth": Checkers.SEARCHER.stats["depth"]}
+
+def run_batch(jobs):
+    # results for a batch, in order; every job gets its share of the time it has left,
+    # so the ones at the back of the batch can still meet their deadlines
+    results = []
+    for i, job in enumerate(jobs):
+        now = time.time()
+        left = job[-1] - now
+        if left <= 0:
+            results.append({"error": "deadline"})
+            continue
+        try:
+            results.append(ai_move(job, now + left / (len(jobs) - i)))
+        except Exception as e:   # one bad job must not take the rest of the batch with it
+            results.append({"error": f"search failed: {e}"})
+    return results
+
+class AIPool:
+    def __init__(self, workers, batch, queue):
+        self.workers = workers
+        self.batch = batch
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"),
+                                            initializer=_init_worker)
+        self.queue = asyncio.Queue(queue)
+        self.slots = asyncio.Semaphore(workers)   # one batch per worker; the rest wait in the queue
+        self.batches = self.jobs = 0
+        self.task = None
+
+    async def start(self):
+        # the workers fork now, before any session exists, and the dispatcher starts
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, run_batch, []) for _ in range(self.workers)))
+        self.task = asyncio.create_task(self.dispatch())
+
+    def submit(self, job):
+        # future for job's result; asyncio.QueueFull when the queue is full
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((job, future))
+        return future
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            now = time.time()
+            live = []
+            for job, future in batch:
+                if future.done():   # its client gave up already
+                    continue
+                if job[-1] <= now:
+                    future.set_result({"error": "deadline"})
+                else:
+                    live.append((job, future))
+            if not live:
+                self.slots.release()
+                continue
+            self.batches += 1
+            self.jobs += len(live)
+            done = loop.run_in_executor(self.executor, run_batch, [job for job, _ in live])
+            done.add_done_callback(functools.partial(self.finish, live))
+
+    def finish(self, live, done):
+        self.slots.release()
+        try:
+            results = done.result()
+        except Exception as e:   # a worker died; the pool is broken from here on
+            results = [{"error": f"worker failed: {e}"}] * len(live)
+        for (_, future), result in zip(live, results):
+            if not future.done():
+                future.set_result(result)
+
+    def close(self):
+        if self.task:
+            self.task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# ================= STATS =================
+def percentiles(latencies):
+    # count and p50 / p90 / p99 / max in ms of a list of latencies in seconds
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"count": 0}
+    pick = lambda p: round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+    return {"count": len(ordered), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": pick(1.0)}
+
+def report(stats):
+    # text table of a stats reply, for the terminal
+    lines = [f"{'game':10s} {'op':6s} {'count':>7s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s}  ms"]
+    for game, ops in sorted(stats["latency"].items()):
+        for op, p in sorted(ops.items()):
+            lines.append(f"{game:10s} {op:6s} {p['count']:7d} " + " ".join(f"{p.get(k, 0):8.1f}" for k in ("p50", "p90", "p99", "max")))
+    lines.append(" ".join(f"{key}={value}" for key, value in stats["counts"].items()))
+    return "\n".join(lines)
+
+class Stats:
+    def __init__(self):
+        self.latency = collections.defaultdict(lambda: collections.deque(maxlen=STATS_KEEP))   # (game, op) -> seconds
+        self.counts = collections.Counter()   # busy, deadline, error replies
+
+    def add(self, game, op, seconds, reply):
+        self.latency[game or "-", op or "-"].append(seconds)
+        if "error" in reply:
+            self.counts[reply["error"] if reply["error"] in ("busy", "deadline") else "error"] += 1
+
+    def summary(self):
+        latency = collections.defaultdict(dict)
+        for (game, op), seconds in self.latency.items():
+            latency[game][op] = percentiles(seconds)
+        return {"latency": latency, "counts": dict(self.counts)}
+
+# ================= SERVER =================
+class GameServer:
+    def __init__(self, pool, deadline_ms=1000, max_sessions=10000, pipeline=32):
+        self.pool = pool
+        self.deadline_ms = deadline_ms
+        self.max_sessions = max_sessions
+        self.pipeline = pipeline   # requests one connection may have in flight before it is no longer read
+        self.sessions = {}
+        self.opened = 0
+        self.stats = Stats()
+
+    async def handle(self, reader, writer):
+        owned = set()   # this connection's sessions
+        lock = asyncio.Lock()
+        slots = asyncio.Semaphore(self.pipeline)
+        tasks = set()
+        try:
+            while True:
+                await slots.acquire()
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.answer(line, owned, writer, lock, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError):   # ValueError: a line longer than the stream limit
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            for sid in owned:
+                self.sessions.pop(sid, None)
+            writer.close()
+
+    async def answer(self, line, owned, writer, lock, slots):
+        # every request gets a reply and gives its pipeline slot back, whatever it holds
+        try:
+            start = time.perf_counter()
+            request, game, op = {}, None, None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request is a JSON object")
+                handler = getattr(self, "op_" + str(request.get("op")), None)
+                if handler is None:
+                    raise ValueError(f"unknown op {request.get('op')!r}")
+                op = request["op"]
+                game, reply = await handler(request, owned)
+            except ValueError as e:   # json.JSONDecodeError included
+                reply = {"error": str(e)}
+            except (TypeError, AttributeError, KeyError) as e:   # a field of the wrong type that got past the checks
+                reply = {"error": f"bad request: {e}"}
+            if isinstance(request, dict) and "id" in request:
+                reply["id"] = request["id"]
+            data = (json.dumps(reply) + "\n").encode()
+            try:
+                async with lock:
+                    writer.write(data)
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            self.stats.add(game, op, time.perf_counter() - start, reply)
+        finally:
+            slots.release()
+
+    def session(self, request, owned):
+        sid = request.get("session")
+        if not isinstance(sid, str) or sid not in owned:
+            raise ValueError(f"no session {sid!r} on this connection")
+        return self.sessions[sid]
+
+    # ---------------- ops: each returns (game, reply) ----------------
+    async def op_new(self, request, owned):
+        game = request.get("game")
+        if game not in SESSIONS:
+            raise ValueError(f"game is one of {', '.join(SESSIONS)}")
+        if len(self.sessions) >= self.max_sessions:
+            return game, {"error": "too many sessions"}
+        options = {key: request[key] for key in ("variant", "level") if key in request}
+        for key, value in options.items():
+            if not isinstance(value, str):
+                raise ValueError(f"{key} is a string")
+        session = SESSIONS[game](**options)
+        self.opened += 1
+        sid = f"{game}-{self.opened}"
+        self.sessions[sid] = session
+        owned.add(sid)
+        return game, {"session": sid, "state": session.state()}
+
+    async def op_move(self, request, owned):
+        session = self.session(request, owned)
+        if session.thinking:
+            raise ValueError("the AI is moving")
+        flips = session.play(request.get("move"))
+        reply = {"state": session.state()}
+        if flips:
+            reply["flips"] = flips
+        return session.game, reply
+
+    async def op_ai(self, request, owned):
+        session = self.session(request, owned)
+        game = session.game
+        if session.thinking:
+            raise ValueError("the AI is moving already")
+        if session.over:
+            raise ValueError("the game is over")
+        if game == "memory":
+            flips = session.ai_turn()
+            return game, {"flips": flips, "state": session.state()}
+
+        try:
+            depth = max(1, min(MAX_DEPTH[game], int(request.get("depth", DEPTH[game]))))
+            deadline_ms = float(request.get("deadline_ms", self.deadline_ms))
+        except (TypeError, ValueError):
+            raise ValueError("depth and deadline_ms are numbers")
+        try:
+            future = self.pool.submit(session.ai_job(depth, time.time() + deadline_ms / 1000))
+        except asyncio.QueueFull:
+            return game, {"error": "busy"}
+        session.thinking = True
+        try:
+            result = await asyncio.wait_for(future, deadline_ms / 1000 + GRACE)
+        except asyncio.TimeoutError:
+            result = {"error": "deadline"}
+        finally:
+            session.thinking = False
+        if "error" in result:
+            return game, result
+        session.play(result["move"])
+        return game, dict(result, state=session.state())
+
+    async def op_state(self, request, owned):
+        session = self.session(request, owned)
+        return session.game, {"state": session.state()}
+
+    async def op_close(self, request, owned):
+        session = self.session(request, owned)
+        owned.discard(request["session"])
+        del self.sessions[request["session"]]
+        return session.game, {"closed": request["session"]}
+
+    async def op_stats(self, request, owned):
+        stats = self.stats.summary()
+        stats.update(sessions=len(self.sessions), queued=self.pool.queue.qsize(),
+                     batches=self.pool.batches, jobs=self.pool.jobs)
+        return None, stats
+
+async def serve(args):
+    # Checkers' pygame.init() would take SIGTERM over, so it runs first; the workers fork
+    # before the loop gets its signal handlers
+    import Checkers  # noqa: F401
+    pool = AIPool(args.workers, args.batch, args.queue)
+    await pool.start()
+    server = GameServer(pool, args.deadline, args.max_sessions, args.pipeline)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle, args.unix)
+        where = args.unix
+    else:
+        listener = await asyncio.start_server(server.handle, args.host, args.port)
+        where = f"{args.host}:{args.port}"
+    print(f"serving on {where} with {args.workers} AI workers", file=sys.stderr, flush=True)
+    try:
+        async with listener:
+            await stop.wait()
+    finally:
+        pool.close()
+        print(report(server.stats.summary()), file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many game sessions with a shared AI pool.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="AI processes")
+    parser.add_argument("--batch", type=int, default=8, help="most AI requests sent to a worker as one task")
+    parser.add_argument("--queue", type=int, default=256, help="most AI requests waiting; more are answered busy")
+    parser.add_argument("--deadline", type=float, default=1000, help="default AI deadline in ms")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--pipeline", type=int, default=32, help="requests in flight per connection")
+    args = parser.parse_args()
+    asyncio.run(serve(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,103 @@
 import pygame
-import subprocess
-import sys
+import importlib
+import time
+
+from render_scheduler import RenderScheduler
 
 pygame.init()
 screen = pygame.display.set_mode((600, 400))
+pygame.display.set_caption("The Playground")
 font = pygame.font.Font(None, 48)
+small = pygame.font.Font(None, 26)
+scheduler = RenderScheduler(screen, 30)
+TK_POLL = 0.01   # seconds between turns of the Memory game's event loop
+
+# ================= LAUNCHING =================
+# games run inside this process: modules are imported on first use and stay
+# in sys.modules, and the pygame games draw into the window we already have
+last_launch = ""
+
+def report(name, start):
+    global last_launch
+    ms = (time.perf_counter() - start) * 1000
+    last_launch = f"{name}: first frame after {ms:.0f} ms"
+    print(last_launch)
+
+def run_pygame(name, module, start):
+    # time from key press to the game's first display update
+    update, flip = pygame.display.update, pygame.display.flip
+
+    def first_frame(real):
+        def draw(*args):
+            pygame.display.update, pygame.display.flip = update, flip
+            result = real(*args)
+            report(name, start)
+            return result
+        return draw
+
+    pygame.display.update, pygame.display.flip = first_frame(update), first_frame(flip)
+    try:
+        module.main()
+    finally:
+        pygame.display.update, pygame.display.flip = update, flip
+
+def run_tk(name, module, start):
+    # tk's own loop instead of mainloop(), so the launcher window keeps being serviced meanwhile
+    import tkinter as tk
+    root = tk.Tk()
+    module.MemoryGame(root)
+    root.update()
+    report(name, start)
+    try:
+        while True:
+            root.update()
+            pygame.event.pump()
+            time.sleep(TK_POLL)
+    except tk.TclError:
+        pass   # the Memory window was closed
 
 games = [
-    ("Connect 4", "connect4_enhanced.py"),
-    ("Memory Game", "MemoryGame.py"),
-    ("Checkers", "Checkers.py")
+    ("Connect 4", "connect4_enhanced", run_pygame),
+    ("Memory Game", "MemoryGame", run_tk),
+    ("Checkers", "Checkers", run_pygame)
 ]
 
+def launch(index):
+    global screen, scheduler
+    name, module_name, runner = games[index]
+    start = time.perf_counter()
+    runner(name, importlib.import_module(module_name), start)
+
+    # back from the game: take the window back and drop keys pressed meanwhile
+    screen = pygame.display.set_mode((600, 400))
+    pygame.display.set_caption("The Playground")
+    pygame.event.clear((pygame.KEYDOWN, pygame.KEYUP))
+    scheduler = RenderScheduler(screen, 30)
+
+keys = {pygame.K_1: 0, pygame.K_2: 1, pygame.K_3: 2}
+
 running = True
 while running:
-    screen.fill((30, 30, 30))
-    y = 50
-    for i, (name, file) in enumerate(games):
-        label = font.render(f"{i+1}. {name}", True, (255,255,255))
-        rect = label.get_rect(center=(300, y))
-        screen.blit(label, rect)
-        y += 70
+    # the menu is static: draw it when (re)shown, then sleep until a key arrives
+    if scheduler.dirty:
+        screen.fill((30, 30, 30))
+        y = 50
+        for i, (name, _, _) in enumerate(games):
+            label = font.render(f"{i+1}. {name}", True, (255,255,255))
+            rect = label.get_rect(center=(300, y))
+            screen.blit(label, rect)
+            y += 70
+        if last_launch:
+            label = small.render(last_launch, True, (160,160,160))
+            screen.blit(label, label.get_rect(center=(300, 360)))
 
-    pygame.display.flip()
+        scheduler.present()
 
-    for event in pygame.event.get():
+    for event in scheduler.wait():
         if event.type == pygame.QUIT:
             running = False
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_1:
-                subprocess.Popen([sys.executable, games[0][1]])
-            if event.key == pygame.K_2:
-                subprocess.Popen([sys.executable, games[1][1]])
-            if event.key == pygame.K_3:
-                subprocess.Popen([sys.executable, games[2][1]])
+        if event.type == pygame.KEYDOWN and event.key in keys:
+            launch(keys[event.key])
+            break
 
 pygame.quit()
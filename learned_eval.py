@@ -0,0 +1,223 @@
+"""Learned evaluation for the Connect 4 and Checkers searches.
+
+Train it once offline, from self-play:
+
+    python learned_eval.py connect4 --games 200
+    python learned_eval.py checkers --games 40
+
+The searcher plays itself from a few random opening moves, and every
+position met is labelled with a deeper search using the hand-written
+evaluation (the centre heuristic plus threat parity, Board.evaluate() plus
+the tablebase). A linear model (--hidden 0) or a one-hidden-layer tanh
+MLP is then fitted to those labels with NumPy.
+
+connect4_search.py and Checkers.py load the file when they are imported.
+They score the leaves below a node in one batch, via the optional
+evaluate_moves() of game_search. Without the file, or without NumPy,
+they keep the hand-written evaluation.
+
+File layout (numpy .npz):
+    game          "connect4 6x7k4" or "checkers"
+    w0, b0, ...   the layers, input first
+    mean, scale   the labels were fitted as (label - mean) / scale
+"""
+import argparse
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:   # the learned evaluation is optional
+    np = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONNECT4_PATH = os.path.join(HERE, "connect4_eval.npz")
+CHECKERS_PATH = os.path.join(HERE, "checkers_eval.npz")
+LABEL_CLIP = 1000   # Checkers labels past this are won or lost anyway (tablebase wins are 100000)
+CONNECT4_LABEL_CLIP = 100   # the same for Connect 4, whose wins score close to connect4_search.WIN
+
+# ================= MODEL =================
+class Model:
+    def __init__(self, game, layers, mean, scale, tag):
+        self.game = game
+        self.layers = layers   # [(w, b)], tanh between them
+        self.mean = mean
+        self.scale = scale
+        self.tag = tag         # names these weights, e.g. in the analysis cache tag
+
+    def score(self, features):
+        # integer scores, one per row of features, in the units of the labels
+        x = features
+        for i, (w, b) in enumerate(self.layers):
+            x = x @ w + b
+            if i < len(self.layers) - 1:
+                x = np.tanh(x)
+        return np.rint(x[:, 0] * self.scale + self.mean).astype(int).tolist()
+
+def load(path, game):
+    # None when NumPy is missing or there is no usable file for game
+    if np is None or not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data["game"]) != game:
+                return None
+            count = sum(1 for name in data.files if name.startswith("w"))
+            layers = [(data[f"w{i}"].astype(np.float32), data[f"b{i}"].astype(np.float32))
+                      for i in range(count)]
+            mean, scale = float(data["mean"]), float(data["scale"])
+        with open(path, "rb") as f:
+            tag = hashlib.sha1(f.read()).hexdigest()[:12]
+    except (OSError, ValueError, KeyError):
+        return None
+    return Model(game, layers, mean, scale, tag)
+
+def save(path, game, layers, mean, scale):
+    arrays = {"game": np.array(game), "mean": np.array(mean), "scale": np.array(scale)}
+    for i, (w, b) in enumerate(layers):
+        arrays[f"w{i}"], arrays[f"b{i}"] = w, b
+    with open(path, "wb") as f:   # a file object, so savez doesn't append .npz to the name
+        np.savez(f, **arrays)
+
+# ================= FEATURES =================
+def bit_features(boards, nbits):
+    # one row per tuple of bitboards, every bitboard spread over nbits columns of 0 / 1
+    nbytes = (nbits + 7) // 8
+    raw = b"".join(bits.to_bytes(nbytes, "little") for board in boards for bits in board)
+    raw = np.frombuffer(raw, np.uint8).reshape(len(boards), -1)
+    return np.unpackbits(raw, axis=1, bitorder="little").astype(np.float32)
+
+def one_hot(rows, width):
+    # one row per list of feature indices, 1 at each of them
+    features = np.zeros((len(rows), width), np.float32)
+    for i, row in enumerate(rows):
+        features[i, row] = 1
+    return features
+
+# ================= FIT =================
+def fit(x, y, hidden=32, epochs=60, lr=0.003, seed=0):
+    # layers, mean and scale for Model; a linear least-squares fit when hidden is 0
+    mean, scale = float(y.mean()), float(y.std()) or 1.0
+    t = ((y - mean) / scale).astype(np.float32)[:, None]
+    if not hidden:
+        a = np.hstack([x, np.ones((len(x), 1), np.float32)])
+        ridge = 1e-3 * np.eye(a.shape[1], dtype=np.float32)
+        w = np.linalg.solve(a.T @ a + ridge, a.T @ t)
+        return [(w[:-1], w[-1])], mean, scale
+
+    rng = np.random.default_rng(seed)
+    params = [rng.normal(0, 1 / math.sqrt(x.shape[1]), (x.shape[1], hidden)).astype(np.float32),
+              np.zeros(hidden, np.float32),
+              rng.normal(0, 1 / math.sqrt(hidden), (hidden, 1)).astype(np.float32),
+              np.zeros(1, np.float32)]
+    # Adam on minibatches of squared error
+    m = [np.zeros_like(p) for p in params]
+    v = [np.zeros_like(p) for p in params]
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(len(x))
+        for start in range(0, len(x), 128):
+            idx = order[start:start + 128]
+            xb, tb = x[idx], t[idx]
+            w1, b1, w2, b2 = params
+            h = np.tanh(xb @ w1 + b1)
+            err = (h @ w2 + b2 - tb) * (2 / len(idx))
+            dh = (err @ w2.T) * (1 - h * h)
+            grads = [xb.T @ dh, dh.sum(0), h.T @ err, err.sum(0)]
+            step += 1
+            for p, g, mp, vp in zip(params, grads, m, v):
+                mp[:] = 0.9 * mp + 0.1 * g
+                vp[:] = 0.999 * vp + 0.001 * g * g
+                p -= lr * (mp / (1 - 0.9 ** step)) / (np.sqrt(vp / (1 - 0.999 ** step)) + 1e-8)
+    return [(params[0], params[1]), (params[2], params[3])], mean, scale
+
+# ================= SELF-PLAY =================
+def connect4_positions(games, depth, label_depth, openings, rng):
+    # (features, labels) from self-play on the classic 6x7 board
+    import connect4_search
+    from game_search import Searcher
+    connect4_search.EVAL_MODEL = None   # labels come from the hand-written evaluation
+    player, labeller = Searcher(), Searcher()
+    features, labels = [], []
+    for _ in range(games):
+        pos = connect4_search.Connect4Position([[" "] * 7 for _ in range(6)], connect4_search.centre_heuristic)
+        plies = 0
+        while pos.terminal() is None:
+            value, _ = labeller.search(pos, label_depth)
+            features.append(pos.features())
+            labels.append(max(-CONNECT4_LABEL_CLIP, min(CONNECT4_LABEL_CLIP, value)))
+            if plies < openings:
+                col = rng.choice(pos.columns())
+            else:
+                _, col = player.search(pos, depth)
+            pos.make(col)
+            plies += 1
+    return np.vstack(features), np.array(labels, np.float32)
+
+def checkers_positions(games, depth, label_depth, openings, rng, max_plies=150):
+    # (features, labels) from self-play, BLUE's point of view; drawn-out games stop at max_plies
+    import Checkers
+    Checkers.EVAL_MODEL = None
+    features, labels = [], []
+    for _ in range(games):
+        board, color = Checkers.Board(), Checkers.RED
+        for plies in range(max_plies):
+            moves = Checkers.SearchPosition(board, color).moves()
+            if not moves:
+                break
+            value, _ = Checkers.search(board, label_depth, color == Checkers.BLUE)
+            if math.isfinite(value):
+                features.append(Checkers.position_features(board, color))
+                labels.append(max(-LABEL_CLIP, min(LABEL_CLIP, value)))
+            if plies < openings:
+                move = rng.choice(moves)
+            else:
+                _, move = Checkers.search(board, depth, color == Checkers.BLUE)
+            board = Checkers.play(board, move)
+            color = Checkers.BLUE if color == Checkers.RED else Checkers.RED
+    return np.vstack(features), np.array(labels, np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train an evaluation from self-play.")
+    parser.add_argument("game", choices=["connect4", "checkers"])
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=3, help="plies searched to pick self-play moves")
+    parser.add_argument("--label-depth", type=int, default=5, help="plies searched to label positions")
+    parser.add_argument("--openings", type=int, default=6, help="random moves opening every game")
+    parser.add_argument("--hidden", type=int, default=32, help="MLP hidden units, 0 for a linear model")
+    parser.add_argument("--epochs", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="weights file (default: the one the game loads)")
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("learned_eval needs NumPy")
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    if args.game == "connect4":
+        x, y = connect4_positions(args.games, args.depth, args.label_depth, args.openings, rng)
+        game, out = "connect4 6x7k4", args.out or CONNECT4_PATH
+    else:
+        x, y = checkers_positions(args.games, args.depth, args.label_depth, args.openings, rng)
+        game, out = "checkers", args.out or CHECKERS_PATH
+    print(f"{len(y)} positions from {args.games} games in {time.perf_counter() - start:.1f}s")
+
+    # a held-out tenth tells whether the fit generalises
+    order = np.random.default_rng(args.seed).permutation(len(y))
+    held = order[:len(y) // 10]
+    train = order[len(y) // 10:]
+    layers, mean, scale = fit(x[train], y[train], args.hidden, args.epochs, seed=args.seed)
+    model = Model(game, layers, mean, scale, "")
+    for name, idx in (("train", train), ("held-out", held)):
+        if len(idx):
+            error = np.abs(np.array(model.score(x[idx])) - y[idx]).mean()
+            print(f"{name} mean abs error {error:.2f} (labels mean abs {np.abs(y[idx]).mean():.2f})")
+    save(out, game, layers, mean, scale)
+    print(f"wrote {out}")
+
+if __name__ == "__main__":
+    main()
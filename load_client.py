@@ -0,0 +1,158 @@
+"""Load generator for game_server.py.
+
+    python game_server.py --workers 4 &
+    python load_client.py --sessions 200 --duration 30
+    python load_client.py --game checkers --sessions 50 --depth 4 --deadline 300
+
+Plays --sessions games at once over --connections connections. In each
+game a random "human" plays against the server's AI: one random legal
+move, then an "ai" request, until the game ends, and then a new game
+starts. With --game all the sessions cycle through the three games.
+
+At the end it prints the requests and AI moves per second, the client's
+latency percentiles per game and op (the wait included) and its busy,
+deadline and error counts, followed by the server's own stats.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import random
+import sys
+import time
+
+from game_server import percentiles, report
+
+GAMES = ["connect4", "checkers", "memory"]
+SIDES = {"connect4": ("X", "O"), "checkers": ("RED", "BLUE"), "memory": (1, 2)}   # as in a state's "turn"
+BUSY_BACKOFF = 0.05   # seconds a session waits after a busy reply before asking again
+
+class Connection:
+    # one socket; requests are matched to their replies by id, so many can be in flight
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.ids = itertools.count(1)
+        self.waiting = {}
+        self.task = asyncio.create_task(self.read())
+
+    @classmethod
+    async def open(cls, args):
+        if args.unix:
+            reader, writer = await asyncio.open_unix_connection(args.unix, limit=1 << 20)
+        else:
+            reader, writer = await asyncio.open_connection(args.host, args.port, limit=1 << 20)
+        return cls(reader, writer)
+
+    async def read(self):
+        while line := await self.reader.readline():
+            reply = json.loads(line)
+            future = self.waiting.pop(reply.get("id"), None)
+            if future and not future.done():
+                future.set_result(reply)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("server closed the connection"))
+
+    async def request(self, **fields):
+        fields["id"] = rid = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[rid] = future
+        self.writer.write((json.dumps(fields) + "\n").encode())
+        await self.writer.drain()
+        return await future
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+class Load:
+    def __init__(self):
+        self.latency = collections.defaultdict(list)   # (game, op) -> seconds
+        self.counts = collections.Counter()
+        self.games = 0
+
+    async def timed(self, conn, game, /, **fields):
+        start = time.perf_counter()
+        reply = await conn.request(**fields)
+        self.latency[game, fields["op"]].append(time.perf_counter() - start)
+        if "error" in reply:
+            self.counts[reply["error"] if reply["error"] in ("busy", "deadline") else "error"] += 1
+        return reply
+
+async def play(conn, game, args, load, rng, end):
+    # games of random moves against the AI until end
+    ai = {"op": "ai"}
+    if args.depth:
+        ai["depth"] = args.depth
+    if args.deadline:
+        ai["deadline_ms"] = args.deadline
+    while time.perf_counter() < end:
+        reply = await load.timed(conn, game, op="new", game=game)
+        if "error" in reply:
+            await asyncio.sleep(BUSY_BACKOFF)
+            continue
+        session, state = reply["session"], reply["state"]
+        human = rng.choice(SIDES[game])   # the side the random player takes
+        plies = 0
+        while not state["over"] and plies < args.max_plies and time.perf_counter() < end:
+            if state["turn"] == human:
+                reply = await load.timed(conn, game, op="move", session=session, move=rng.choice(state["moves"]))
+            else:
+                reply = await load.timed(conn, game, session=session, **ai)
+                if reply.get("error") == "busy":
+                    await asyncio.sleep(BUSY_BACKOFF)
+                    continue
+            if "error" in reply:
+                if reply["error"] == "deadline":
+                    continue
+                print(f"{game}: {reply['error']}", file=sys.stderr)
+                break
+            state = reply["state"]
+            plies += 1
+        load.games += state["over"]
+        await load.timed(conn, game, op="close", session=session)
+
+async def run(args):
+    rng = random.Random(args.seed)
+    conns = [await Connection.open(args) for _ in range(args.connections)]
+    load = Load()
+    games = GAMES if args.game == "all" else [args.game]
+    start = time.perf_counter()
+    end = start + args.duration
+    await asyncio.gather(*(play(conns[i % len(conns)], games[i % len(games)], args, load,
+                                random.Random(rng.random()), end) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    server = await conns[0].request(op="stats")
+    for conn in conns:
+        conn.close()
+
+    requests = sum(len(v) for v in load.latency.values())
+    ai_moves = sum(len(v) for (game, op), v in load.latency.items() if op == "ai") - load.counts["busy"]
+    print(f"{requests} requests in {elapsed:.1f}s: {requests / elapsed:.0f} requests/s, "
+          f"{ai_moves / elapsed:.0f} AI moves/s, {load.games} games finished")
+    latency = collections.defaultdict(dict)
+    for (game, op), seconds in load.latency.items():
+        latency[game][op] = percentiles(seconds)
+    print("client:")
+    print(report({"latency": latency, "counts": {k: load.counts[k] for k in ("busy", "deadline", "error")}}))
+    print(f"server: {server['sessions']} sessions, {server['jobs']} AI jobs in {server['batches']} batches")
+    print(report(server))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test game_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to this unix socket instead of TCP")
+    parser.add_argument("--game", choices=GAMES + ["all"], default="all")
+    parser.add_argument("--sessions", type=int, default=100, help="games played at once")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run")
+    parser.add_argument("--depth", type=int, help="AI search depth (server default when left out)")
+    parser.add_argument("--deadline", type=float, help="AI deadline in ms (server default when left out)")
+    parser.add_argument("--max-plies", type=int, default=200, help="a game this long is abandoned")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Headless Memory game simulator.
+
+Plays AI-vs-AI games on MemoryState with no window and no delays, spread
+over a process pool, and reports win rates, turns per game and how long
+each AIPlayer.choose() call took:
+
+    python memory_sim.py --games 1000000 --sizes 4x4,6x6,10x10 --matchups Hard:Easy,Hard:Medium
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from MemoryGame import AI_LEVELS, AIPlayer, MemoryState
+
+LATENCY_BUCKETS = 32   # power-of-two buckets in nanoseconds, so stats stay a fixed size
+
+def new_stats():
+    return {"games": 0, "wins_a": 0, "wins_b": 0, "draws": 0, "turns": 0,
+            "decisions": 0, "choose_ns": 0, "latency": [0] * LATENCY_BUCKETS}
+
+def merge(total, part):
+    for key, value in part.items():
+        if key == "latency":
+            total[key] = [a + b for a, b in zip(total[key], value)]
+        else:
+            total[key] += value
+
+def play_game(state, players, stats):
+    # players: {1: AIPlayer, 2: AIPlayer}; returns the winner like MemoryState.winner()
+    latency = stats["latency"]
+    clock = time.perf_counter_ns
+    while not state.over():
+        ai = players[state.turn]
+        first = None
+        for _ in range(2):
+            start = clock()
+            pos = ai.choose(first)
+            spent = clock() - start
+            stats["choose_ns"] += spent
+            stats["decisions"] += 1
+            latency[min(spent.bit_length(), LATENCY_BUCKETS - 1)] += 1
+
+            value = state.flip(pos)
+            for p in players.values():
+                p.remember(pos, value)
+            first = pos
+
+        a, b = state.first, state.second
+        if state.resolve():
+            for p in players.values():
+                p.matched(a, b)
+    return state.winner()
+
+def run_chunk(job):
+    # one batch of games for a single size and matchup; a and b swap who starts
+    rows, cols, level_a, level_b, games, seed = job
+    random.seed(seed)
+    stats = new_stats()
+    for i in range(games):
+        state = MemoryState(rows, cols)
+        a = AIPlayer(state.values, *AI_LEVELS[level_a])
+        b = AIPlayer(state.values, *AI_LEVELS[level_b])
+        a_first = i % 2 == 0
+        winner = play_game(state, {1: a, 2: b} if a_first else {1: b, 2: a}, stats)
+        if winner == 0:
+            stats["draws"] += 1
+        elif (winner == 1) == a_first:
+            stats["wins_a"] += 1
+        else:
+            stats["wins_b"] += 1
+        stats["games"] += 1
+        stats["turns"] += state.turns
+    return (rows, cols, level_a, level_b), stats
+
+def percentile(latency, fraction):
+    # upper edge of the bucket holding the given fraction of decisions, in microseconds
+    target = fraction * sum(latency)
+    seen = 0
+    for bucket, count in enumerate(latency):
+        seen += count
+        if seen >= target:
+            return (1 << bucket) / 1000
+    return float("inf")
+
+def report(results, elapsed):
+    print(f"{'board':>7} {'matchup':>15} {'games':>9} {'A win':>7} {'B win':>7} {'draw':>6} "
+          f"{'turns':>7} {'mean us':>8} {'p99 us':>8}")
+    for (rows, cols, level_a, level_b), s in sorted(results.items()):
+        games = s["games"]
+        print(f"{rows}x{cols:<5} {level_a + ' v ' + level_b:>15} {games:9d} "
+              f"{s['wins_a'] / games:7.1%} {s['wins_b'] / games:7.1%} {s['draws'] / games:6.1%} "
+              f"{s['turns'] / games:7.1f} {s['choose_ns'] / s['decisions'] / 1000:8.2f} "
+              f"{percentile(s['latency'], 0.99):8.2f}")
+    total = sum(s["games"] for s in results.values())
+    print(f"{total} games in {elapsed:.1f}s ({total / elapsed:.0f} games/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate AI-vs-AI Memory games headlessly.")
+    parser.add_argument("--games", type=int, default=10000, help="games per size and matchup")
+    parser.add_argument("--sizes", default="4x4,6x6", help="comma separated, e.g. 4x4,6x6,10x10")
+    parser.add_argument("--matchups", default="Hard:Hard,Hard:Medium,Hard:Easy",
+                        help=f"comma separated A:B pairs of {', '.join(AI_LEVELS)}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=2000, help="games per pool task")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sizes = [tuple(map(int, s.split("x"))) for s in args.sizes.split(",")]
+    matchups = [tuple(m.split(":")) for m in args.matchups.split(",")]
+    for rows, cols in sizes:
+        if rows * cols % 2:
+            parser.error(f"{rows}x{cols} has an odd number of cards")
+    for pair in matchups:
+        if len(pair) != 2 or any(level not in AI_LEVELS for level in pair):
+            parser.error(f"bad matchup {':'.join(pair)}")
+
+    jobs = []
+    for rows, cols in sizes:
+        for level_a, level_b in matchups:
+            for start in range(0, args.games, args.chunk):
+                games = min(args.chunk, args.games - start)
+                jobs.append((rows, cols, level_a, level_b, games, args.seed + len(jobs)))
+
+    results = {}
+    start = time.time()
+    with multiprocessing.Pool(args.workers) as pool:
+        for key, stats in pool.imap_unordered(run_chunk, jobs):
+            merge(results.setdefault(key, new_stats()), stats)
+    report(results, time.time() - start)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Opt-in profiling of AI moves.
+
+Set AI_PROFILE_DIR before starting any of the games:
+
+    AI_PROFILE_DIR=profiles python connect4_enhanced.py
+
+and every call wrapped with @profiled is run under cProfile while a
+sampling thread records its call stacks. Each call leaves, in that
+directory:
+
+    <pid>-<n>-<function>-d<depth>.prof     pstats (python -m pstats, snakeviz, ...)
+    <pid>-<n>-<function>-d<depth>.folded   collapsed stacks (flamegraph.pl, speedscope)
+
+and one line in index.tsv with the time taken and the position searched.
+When AI_PROFILE_DIR is not set, @profiled hands back the function itself.
+"""
+import cProfile
+import collections
+import functools
+import itertools
+import os
+import sys
+import threading
+import time
+
+PROFILE_DIR = os.environ.get("AI_PROFILE_DIR")
+SAMPLE_INTERVAL = 0.001   # seconds between stack samples
+
+_calls = itertools.count(1)
+_local = threading.local()   # cProfile can't nest, so inner profiled calls just run
+_index_lock = threading.Lock()
+
+class StackSampler:
+    # samples one thread's stack from a helper thread, counting identical stacks
+    def __init__(self, ident, root_code):
+        self.ident = ident
+        self.root_code = root_code
+        self.stacks = collections.Counter()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.ident)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                if code is self.root_code:
+                    break
+                frame = frame.f_back
+            else:
+                continue   # not inside the profiled call (yet, or any more)
+            self.stacks[";".join(reversed(names))] += 1
+
+    def finish(self):
+        self.stop.set()
+        self.thread.join()
+        return self.stacks
+
+def profiled(describe):
+    """Profile every call of the decorated function into PROFILE_DIR.
+
+    describe(*args, **kwargs) gets the call's arguments and returns
+    (position, depth) to tag the output with; position is a short string.
+    """
+    def wrap(func):
+        if not PROFILE_DIR:
+            return func
+
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            if getattr(_local, "active", False):
+                return func(*args, **kwargs)
+            position, depth = describe(*args, **kwargs)
+            _local.active = True
+            profile = cProfile.Profile()
+            sampler = StackSampler(threading.get_ident(), func.__code__)
+            start = time.perf_counter()
+            try:
+                profile.enable()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+            finally:
+                elapsed = time.perf_counter() - start
+                stacks = sampler.finish()
+                _local.active = False
+                write(func.__qualname__, position, depth, elapsed, profile, stacks)
+        return run
+    return wrap
+
+def write(name, position, depth, elapsed, profile, stacks):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = f"{os.getpid()}-{next(_calls):04d}-{name.replace('.', '_')}-d{depth}"
+    path = os.path.join(PROFILE_DIR, base)
+    profile.dump_stats(path + ".prof")
+    with open(path + ".folded", "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with _index_lock, open(os.path.join(PROFILE_DIR, "index.tsv"), "a") as f:
+        f.write(f"{base}\t{name}\t{depth}\t{elapsed * 1000:.2f}\t{position}\n")
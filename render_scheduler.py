@@ -0,0 +1,77 @@
+import pygame
+
+# the window was uncovered or resized and has to be repainted in full
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWEXPOSED)
+
+# ================= RENDER SCHEDULER =================
+# Shared by the pygame front-ends (gamee.py, Connect4.py, connect4_enhanced.py,
+# Checkers.py). A frame is only drawn when something asked for it through
+# invalidate(), only the invalidated rectangles are sent to the display, and
+# while nothing is animating the loop sleeps inside pygame.event.wait()
+# instead of spinning through clock.tick().
+class RenderScheduler:
+    def __init__(self, surface, fps=60):
+        self.surface = surface
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.background = None   # pre-rendered static layer, see set_background()
+        self.rects = []
+        self.full = True
+        self.animating = 0       # > 0 while some animation needs steady frames
+
+    def set_background(self, paint):
+        # paint(surface) draws everything that never changes, once
+        self.background = pygame.Surface(self.surface.get_size())
+        paint(self.background)
+        self.invalidate()
+
+    def invalidate(self, rect=None):
+        # mark part of the window (or all of it) as needing a redraw
+        if rect is None:
+            self.full = True
+        elif not self.full:
+            self.rects.append(pygame.Rect(rect))
+
+    @property
+    def dirty(self):
+        return self.full or bool(self.rects)
+
+    def dirty_rects(self):
+        # what the front-end has to repaint this frame; None means everything
+        return None if self.full else list(self.rects)
+
+    def restore(self, rect=None):
+        # copy the static layer back over rect (or the whole window)
+        if rect is None:
+            self.surface.blit(self.background, (0, 0))
+        else:
+            self.surface.blit(self.background, rect, rect)
+
+    def present(self):
+        if self.full:
+            pygame.display.update()
+        elif self.rects:
+            pygame.display.update(self.rects)
+        self.rects = []
+        self.full = False
+
+    def wait(self, timeout=None):
+        """Events for this iteration of the loop.
+
+        While animating (or with timeout=0) this paces the loop at fps and
+        returns whatever is queued; otherwise it blocks until an event
+        arrives or timeout milliseconds pass.
+        """
+        if self.animating or self.dirty or timeout == 0:
+            self.clock.tick(self.fps)
+            events = pygame.event.get()
+        else:
+            if timeout is None:
+                first = pygame.event.wait()
+            else:
+                first = pygame.event.wait(max(1, int(timeout)))
+            events = [first] if first.type != pygame.NOEVENT else []
+            events += pygame.event.get()
+        if any(e.type in EXPOSE_EVENTS for e in events):
+            self.invalidate()
+        return events
@@ -0,0 +1,49 @@
+"""Checkers' RootSearchPool must agree with the serial search.
+
+    python -m pytest -q test_root_search.py
+
+Both searches of every position start from empty tables, and both must
+return the same (value, move): the value because they search the same
+tree, the move because both break ties in the game's own move order.
+"""
+import os
+import random
+
+import pytest
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import Checkers  # noqa: E402
+from checkers_perft import POSITIONS  # noqa: E402
+
+DEPTH = 6
+
+def playout(seed, plies):
+    # position after plies random moves from the start, None if the game ended first
+    rng = random.Random(seed)
+    board, color = Checkers.Board(), Checkers.RED
+    for _ in range(plies):
+        moves = Checkers.SearchPosition(board, color).moves()
+        if not moves:
+            return None
+        board = Checkers.play(board, rng.choice(moves))
+        color = Checkers.BLUE if color == Checkers.RED else Checkers.RED
+    return Checkers.board_tag(board, color)
+
+TAGS = [tag for _, tag, _ in POSITIONS if tag]
+TAGS += [tag for tag in (playout(seed, plies) for seed in range(10) for plies in (4, 12, 24, 36)) if tag]
+
+@pytest.fixture
+def pool():
+    Checkers.SEARCHER.table.clear()   # forked workers start from an empty table too
+    pool = Checkers.RootSearchPool(2)
+    yield pool
+    pool.close()
+
+@pytest.mark.parametrize("tag", TAGS)
+def test_pool_matches_serial(tag, pool):
+    board, color = Checkers.board_from_tag(tag)
+    max_player = color == Checkers.BLUE
+    parallel = pool.search(board, DEPTH, max_player)
+    Checkers.SEARCHER.table.clear()
+    serial = Checkers.search(board, DEPTH, max_player)
+    assert parallel == serial